@@ -0,0 +1,69 @@
+"""
+Measures the memory held per marc_21.Record (including its Titles): the slotted dataclasses
+against plain dataclasses with the same fields, using the rows of a sample file.
+Run from the project root:
+    uv run python dev/measure_record_memory.py [input_file] [copies]
+"""
+
+import sys
+import tracemalloc
+from dataclasses import fields, make_dataclass
+from pathlib import Path
+
+from art_cats import logic, marc_21
+from art_cats.settings import Default_settings
+
+SAMPLE_FILE = Path("input_files/AuctionCats.2025sep.updated.csv")
+COPIES = 100
+
+
+def load_records(file_path: Path, copies: int) -> list[marc_21.Record]:
+    settings = Default_settings()
+    settings.known_patterns = logic.known_patterns
+    settings.files.in_file = str(file_path)
+    _, _, rows, _, COL = logic.get_existing_file(settings)
+    rows_to_export, _ = logic.filter_rows_for_export(rows, settings, COL)
+    rows = list(logic.iter_rows_formatted_for_marc(rows_to_export, settings))
+    return marc_21.parse_rows_into_records(rows * copies, settings)
+
+
+def rebuild(records: list[marc_21.Record], record_class: type, title_class: type) -> list:
+    """new Record / Title containers around the same field values"""
+    return [
+        record_class(*(
+            title_class(value.original, value.transliteration)
+            if isinstance(value, marc_21.Title)
+            else value
+            for value in (getattr(record, f.name) for f in fields(marc_21.Record))
+        ))
+        for record in records
+    ]
+
+
+def bytes_per_record(records: list[marc_21.Record], record_class: type, title_class: type) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rebuilt = rebuild(records, record_class, title_class)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del rebuilt
+    return (after - before) / len(records)
+
+
+def main() -> int:
+    file_path = Path(sys.argv[1]) if len(sys.argv) > 1 else SAMPLE_FILE
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else COPIES
+    records = load_records(file_path, copies)
+    PlainTitle = make_dataclass("PlainTitle", [f.name for f in fields(marc_21.Title)])
+    PlainRecord = make_dataclass("PlainRecord", [f.name for f in fields(marc_21.Record)])
+
+    plain = bytes_per_record(records, PlainRecord, PlainTitle)
+    slotted = bytes_per_record(records, marc_21.Record, marc_21.Title)
+    print(f"{len(records)} records from {file_path.name} (field values shared, so only the containers are counted)")
+    print(f"plain dataclass:   {plain:6.0f} bytes per record")
+    print(f"slotted dataclass: {slotted:6.0f} bytes per record ({1 - slotted / plain:.0%} less)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Headless CSV / Excel -> MARC 21 (.mrk & .mrc) conversion.
+The GUI (PySide6) is never imported, so this runs on a server or from cron, e.g.
+    artcats-convert input_files/ --output-dir output_files
+"""
+
+import argparse
+import logging
+from collections.abc import Iterable
+from pathlib import Path
+
+from . import log_setup
+from . import logic
+from .settings import Default_settings
+
+logger = logging.getLogger(__name__)
+
+FILE_TYPES = (".csv", ".tsv", ".xlsx", ".xlsm")
+
+
+def convert_file(
+    file_path: Path, output_dir: Path | None = None, workers: int | None = 1
+) -> Path | None:
+    """
+    Returns the path (without suffix) of the .mrk / .mrc files created,
+    or None if the file doesn't match a pattern that can be exported as MARC
+    """
+    settings = Default_settings()
+    settings.known_patterns = logic.known_patterns
+    settings.files.in_file = str(file_path)
+    if output_dir:
+        settings.files.full_output_dir = output_dir
+    pattern_name, _, rows, _, COL = logic.get_existing_file(settings, stream_rows=True)
+    if not pattern_name or not settings.show_marc_button:
+        logger.info(
+            f"Skipped {file_path.name}: it doesn't match a pattern that can be saved as MARC."
+        )
+        rows.close()
+        return None
+    settings.marc_build_workers = workers
+    file_name_with_path = settings.files.full_output_dir / settings.files.out_file
+    record_count, skipped = logic.export_rows_as_marc(
+        rows, file_name_with_path, settings, COL
+    )
+    logger.info(
+        f'The {record_count} records in "{file_path.name}" have been saved as "{file_name_with_path.stem}.mrk" in *{settings.files.full_output_dir}*. {logic.describe_skipped_rows(skipped)}'.rstrip()
+    )
+    return file_name_with_path
+
+
+def convert_files(
+    file_paths: Iterable[Path], output_dir: Path | None = None, workers: int | None = 1
+) -> tuple[dict[Path, Path | None], list[Path]]:
+    """
+    Directories are searched (non-recursively) for csv / excel files.
+    A file that fails to convert is logged and doesn't stop the rest of the batch.
+    Returns the result of each file (None if skipped or failed) & the files that failed.
+    """
+    results: dict[Path, Path | None] = {}
+    failed: list[Path] = []
+    for file_path in expand_file_paths(file_paths):
+        logger.info(f"\n>>>>> processing: {file_path.name}")
+        try:
+            results[file_path] = convert_file(file_path, output_dir, workers)
+        except Exception:
+            logger.exception(f"Failed to convert {file_path}")
+            results[file_path] = None
+            failed.append(file_path)
+    return results, failed
+
+
+def expand_file_paths(file_paths: Iterable[Path]) -> list[Path]:
+    expanded: list[Path] = []
+    for file_path in file_paths:
+        if file_path.is_dir():
+            expanded.extend(
+                sorted(
+                    file
+                    for file in file_path.iterdir()
+                    if file.suffix.lower() in FILE_TYPES
+                )
+            )
+        else:
+            expanded.append(file_path)
+    return expanded
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="artcats-convert",
+        description="Convert csv / excel files of a known pattern into MARC 21 (.mrk & .mrc) files.",
+    )
+    parser.add_argument(
+        "files", nargs="+", type=Path, help="files, or directories of files, to convert"
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=Path,
+        default=None,
+        help=f"where to write the MARC files (default: {Default_settings.files.full_output_dir})",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="processes used to build the records; 0 = one per cpu (default: 1)",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="only report warnings and errors"
+    )
+    args = parser.parse_args(argv)
+
+    output_dir = args.output_dir or Default_settings.files.full_output_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+    log_setup.setup_app_logging(
+        log_file_path=output_dir / "logger.log",
+        level=logging.WARNING if args.quiet else logging.INFO,
+    )
+    results, failed = convert_files(args.files, output_dir, args.workers or None)
+    converted = [file for file, result in results.items() if result]
+    print(
+        f"{len(converted)} of {len(results)} file(s) converted to MARC 21; {len(failed)} failed."
+    )
+    ## * files skipped for not matching a MARC pattern are expected (e.g. order forms), so only failures count
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
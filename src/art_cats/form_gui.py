@@ -3,7 +3,6 @@ Common resources
 """
 
 import logging
-from tkinter import W
 import pprint
 
 from . import log_setup
@@ -11,22 +10,26 @@ from . import log_setup
 
 from enum import Enum, EnumType
 from .settings import Default_settings
-from . import marc_21
 from . import validation
 from . import io
 from . import logic
+from . import search
 
 # import argparse
 from datetime import datetime
 
 # import yaml
 import sys
+import threading
+import time
 
 # import csv
 from enum import Enum, auto
 from dataclasses import dataclass, fields
 from collections import namedtuple
-from typing import Any
+from typing import Any, TYPE_CHECKING
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
 from pprint import pprint
@@ -49,11 +52,12 @@ from PySide6.QtWidgets import (
     QCheckBox,
     QComboBox,
     QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QAbstractItemView,
     QHBoxLayout,
     QSpinBox,
     QFrame,
+    QProgressDialog,
     # QSpacerItem,
 )
 from PySide6.QtCore import (
@@ -63,6 +67,11 @@ from PySide6.QtCore import (
     QEvent,
     Signal,
     QObject,
+    QThread,
+    QAbstractTableModel,
+    QModelIndex,
+    QPersistentModelIndex,
+    QStringListModel,
 )
 from PySide6.QtGui import (
     QMouseEvent,
@@ -73,6 +82,9 @@ from PySide6.QtGui import (
 
 logger = logging.getLogger(__name__)
 
+if TYPE_CHECKING:
+    from . import marc_21
+
 
 class STATUS(Enum):
     occupied = auto()
@@ -113,10 +125,9 @@ class WindowWithRightTogglePanel(QWidget):
 
         # --- 2. Help Panel Setup (Column 1, Fixed Width) ---
         self.help_widget = QTextBrowser()
-        ## NB pyside6 does not natively implement internal links in markdown (hence the use of html)
-        html_path = Path.cwd() / settings.files.app_dir / settings.files.help_file
-        html_content = io.load_plaintext_from_file(str(html_path))
-        self.help_widget.setHtml(html_content)
+        ## * the help html is read & rendered the first time the panel is shown (see load_help())
+        self.help_is_loaded = False
+        self.help_widget.installEventFilter(self)
         self.help_widget.anchorClicked.connect(self.handle_link_click)
 
         self.help_widget.setReadOnly(True)
@@ -139,6 +150,19 @@ class WindowWithRightTogglePanel(QWidget):
         self.saved_editor_width = self.edit_panel_widget.width()
         self.centre_window_in_display()
 
+    def eventFilter(self, watched, event):
+        if watched is self.help_widget and event.type() == QEvent.Type.Show:
+            self.load_help()
+        return super().eventFilter(watched, event)
+
+    def load_help(self) -> None:
+        if self.help_is_loaded:
+            return
+        self.help_is_loaded = True
+        ## NB pyside6 does not natively implement internal links in markdown (hence the use of html)
+        html_path = Path.cwd() / self.settings.files.app_dir / self.settings.files.help_file
+        self.help_widget.setHtml(io.load_plaintext_from_file(str(html_path)))
+
     def centre_window_in_display(self) -> None:
         screen_geometry = QApplication.primaryScreen().geometry()
         window_frame = self.frameGeometry()
@@ -288,6 +312,79 @@ class ClickableLabel(QLabel):
         super().leaveEvent(event)
 
 
+class RecordTableModel(QAbstractTableModel):
+    """
+    The table of records, read straight from Data.excel_rows:
+    the view only asks for the cells it shows, so nothing is rebuilt on navigation.
+    logic.add_record() & delete_record() report each change (inserting_rows, removing_rows, rows_changed).
+    """
+
+    EMPTY_TABLE_TEXT = "no order items added yet"
+
+    def __init__(self, records: logic.Data, parent=None) -> None:
+        super().__init__(parent)
+        self.records = records
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        ## * without records, a single row holds the EMPTY_TABLE_TEXT
+        return len(self.records.excel_rows) if self.records.has_records else 1
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        if self.records.has_records and self.records.excel_rows:
+            return len(self.records.excel_rows[0])
+        return len(self.records.headers)
+
+    def data(self, index: QModelIndex | QPersistentModelIndex, role=Qt.ItemDataRole.DisplayRole) -> Any:
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        if not self.records.has_records:
+            return self.EMPTY_TABLE_TEXT if index.column() == 0 else ""
+        row = self.records.excel_rows[index.row()]
+        return row[index.column()] if index.column() < len(row) else ""
+
+    def headerData(self, section: int, orientation, role=Qt.ItemDataRole.DisplayRole) -> Any:
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal and section < len(self.records.headers):
+            return self.records.headers[section]
+        return super().headerData(section, orientation, role)
+
+    @contextmanager
+    def inserting_rows(self, first: int, last: int) -> Iterator[None]:
+        self.beginInsertRows(QModelIndex(), first, last)
+        try:
+            yield
+        finally:
+            self.endInsertRows()
+
+    @contextmanager
+    def removing_rows(self, first: int, last: int) -> Iterator[None]:
+        self.beginRemoveRows(QModelIndex(), first, last)
+        try:
+            yield
+        finally:
+            self.endRemoveRows()
+
+    @contextmanager
+    def resetting(self) -> Iterator[None]:
+        """for wholesale changes, e.g. a new file being opened"""
+        self.beginResetModel()
+        try:
+            yield
+        finally:
+            self.endResetModel()
+
+    def rows_changed(self, first: int, last: int | None = None) -> None:
+        last = first if last is None else last
+        self.dataChanged.emit(
+            self.index(first, 0), self.index(last, max(self.columnCount() - 1, 0))
+        )
+
+
 class Editor(QWidget):
     widget_lookup = {
         "line": QLineEdit,
@@ -314,12 +411,18 @@ class Editor(QWidget):
 
         self.grid = grid
         self.data = logic.initialise_data(
-            excel_rows, len(settings.layout_template), headers
+            excel_rows,
+            len(settings.layout_template),
+            headers,
+            settings.files.in_file if settings.is_existing_file else "",
         )
         self.caller = caller
         self.settings = settings
         self.COL = COL
         self.app = app
+        self.record_table = RecordTableModel(self.data, self)
+        ## * options source -> (shared model of options, option -> index)
+        self.combo_models: dict[str, tuple[QStringListModel, dict[str, int]]] = {}
 
         self.master_layout = QVBoxLayout()
         inputs_layout = QGridLayout()
@@ -347,6 +450,8 @@ class Editor(QWidget):
         self.update_title_with_record_number()
         self.update_nav_buttons()
         self.add_signal_to_fire_on_text_change()
+        ## ** covers both the close button & closing the window directly
+        self.app.aboutToQuit.connect(self.save_all_changes)
 
     def add_input_widgets(self, inputs_layout):
         self.labels: list[QLabel] = []
@@ -412,7 +517,13 @@ class Editor(QWidget):
 
     def build_nav_buttons(self, caller, nav_grid):
         if self.settings.show_table_view:
-            self.tableView = QTableWidget()
+            self.tableView = QTableView()
+            self.tableView.setModel(self.record_table)
+            self.tableView.verticalHeader().setDefaultSectionSize(30)
+            self.tableView.clicked.connect(self.pass_table_row_index)
+            self.record_table.rowsInserted.connect(self.fit_table_height)
+            self.record_table.rowsRemoved.connect(self.fit_table_height)
+            self.record_table.modelReset.connect(self.fit_table_height)
             self.tableView.setSelectionBehavior(
                 QAbstractItemView.SelectionBehavior.SelectRows
             )
@@ -477,6 +588,14 @@ class Editor(QWidget):
         nav_grid.addWidget(self.load_file_btn, last_row, 0, 1, 1)
         nav_grid.addWidget(self.close_btn, last_row, 2, 1, 1)
         nav_grid.addWidget(self.help_btn, last_row, 3, 1, 1)
+        last_row += 1
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText(
+            "Search records (words or the start of words, a barcode or an ISBN) & press Enter"
+        )
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.returnPressed.connect(self.handle_search)
+        nav_grid.addWidget(self.search_box, last_row, 0, 1, 4)
         if self.settings.show_marc_button:
             self.marc_btn = QPushButton("Export as MARC")
             self.marc_btn.clicked.connect(self.handle_marc_files)
@@ -502,21 +621,17 @@ class Editor(QWidget):
 
         if self.settings.combos.leaders:
             self.setup_combo_boxes()
-            self.load_table(self.tableView, self.data.excel_rows)
+            self.show_table_state()
 
     def setup_combo_boxes(self) -> None:
         ## set up lists of leaders & followers & populate drop down lists for leaders
+        self.build_combo_models()
         for input_widget in self.inputs:
             if isinstance(input_widget, QComboBox):
                 name = input_widget.objectName()
                 if name in self.settings.combos.independents:
                     # print(f" ======= {name} is independent")
-                    raw_options = self.get_raw_combo_options(
-                        self.transform_into_yaml_lookup(name)
-                    )
-                    options, _ = self.get_normalized_combo_list(
-                        input_widget.objectName(), raw_options
-                    )
+                    source = self.transform_into_yaml_lookup(name)
                 else:
                     leader_name = self.settings.combos.dict_by_follower[name]
                     leader_widget = self.leader_inputs[leader_name]
@@ -525,14 +640,49 @@ class Editor(QWidget):
                         self.handle_update_follower
                     )
                     source = self.get_combo_options_source(input_widget)
-                    raw_options = self.get_raw_combo_options(source)
-                    options, _ = self.get_normalized_combo_list(
-                        input_widget.objectName(), raw_options
-                    )
-                input_widget.clear()
-                input_widget.addItems(options)
+                model, _ = self.get_combo_model(source)
+                input_widget.setModel(model)
                 input_widget.setCurrentIndex(0)
 
+    def build_combo_models(self) -> None:
+        """
+        One model of options (with an option -> index lookup) per options source,
+        built once & shared by every combo box that draws on it.
+        The options & lookups come ready-made from the combo data (see logic.compile_combo_data).
+        """
+        for key in self.settings.combos.data:
+            self.get_combo_model(key)
+
+    def get_combo_model(self, source: str) -> tuple[QStringListModel, dict[str, int]]:
+        if source not in self.combo_models:
+            compiled = self.settings.combos.data.get(source)
+            if compiled is None:
+                ## * e.g. a follower whose leader has no selection yet
+                compiled = logic.compile_combo_options(self.get_raw_combo_options(source))
+            options, index_by_option = compiled
+            if options == [logic.MISSING_COMBO_OPTIONS]:
+                logger.warning("\t\t-- Combo list missing options!!")
+            self.combo_models[source] = (QStringListModel(options, self), index_by_option)
+        return self.combo_models[source]
+
+    def get_combo_index(
+        self, combo_name: str, model: QStringListModel, index_by_option: dict[str, int], selected_item=""
+    ) -> int:
+        """The index of selected_item in the combo box's options (0 = the instruction to choose one)"""
+        if (
+            model.rowCount() < 2
+            or not selected_item
+            or selected_item == self.settings.combos.default_text
+        ):
+            return 0
+        index = index_by_option.get(selected_item)
+        if index is None:
+            logger.warning(
+                f"The option *{selected_item}* is not an item in the combo box '{combo_name}'!"
+            )
+            index = 0
+        return index
+
     def handle_update_follower(self) -> None:
         # leader: QComboBox = self.sender()
         leader: QObject = self.sender()
@@ -566,76 +716,24 @@ class Editor(QWidget):
         return match_for_yaml_lookup
 
     def get_raw_combo_options(self, key: str) -> list:
-        if key:
-            if key.startswith("*!*"):
-                raw_options = [
-                    f"{self.settings.combos.following_default_text}{key.split(":")[1]}) "
-                ]
-            else:
-                options = self.settings.combos.data
-                raw_options = options.get(key, [])
+        """For sources not in the (compiled) combo data: see get_combo_model()"""
+        if key and key.startswith("*!*"):
+            raw_options = [
+                f"{self.settings.combos.following_default_text}{key.split(":")[1]}) "
+            ]
         else:
             raw_options = []
         # print(f"\t** get raw combo options: {key=} -> raw_options={raw_options[:2]}... >> {inspect.stack()[1].function}")
         return raw_options
 
-    def get_normalized_combo_list(
-        self, combo_name: str, raw_combo_options: list, selected_item=""
-    ) -> tuple[list[str], int]:
-        """
-        returns list with default "choose" text if more than one option
-        and the index of any selected item or default -1
+    def highlight_row_by_index(self, table_view: QTableView, row_index: int):
         """
-        default_text = self.settings.combos.default_text
-        ## If more than one option, add in instruction to select an option
-        option_count = len(raw_combo_options)
-        new_combo_options = []
-        if option_count == 0:
-            logger.warning("\t\t-- Combo list missing options!!")
-            new_combo_options = ["<missing data>"]
-            index = 0
-        elif option_count == 1:
-            ## if only one option, select it
-            new_combo_options = raw_combo_options
-            index = 0
-        else:
-            ## if several options, add in an instruction to choose one
-            new_combo_options = [default_text, *raw_combo_options]
-            if selected_item == default_text:
-                selected_item = ""
-            # print(f">>> 1: {selected_item=}, {type(selected_item)}")
-            if selected_item:
-                try:
-                    index = new_combo_options.index(selected_item)
-                    ## Case-insensitive index search for transitional data using True/TRUE
-                    # index = next(
-                    #     (
-                    #         i
-                    #         for i, x in enumerate(new_combo_options)
-                    #         if x.lower() == selected_item.lower()
-                    #     ),
-                    #     None,
-                    # )
-                except ValueError:
-                    logger.warning(
-                        f"The option *{selected_item}* is not an item in the combo box '{combo_name}'!"
-                    )
-                    index = 0
-            else:
-                # the default index if no selection
-                index = 0
-        # print(f"\tget normalized combo list: {len(new_combo_options)}, {selected_item=}->{index=}, {new_combo_options[:2]}...\n")
-        return (new_combo_options, index)
-
-    def highlight_row_by_index(self, table_widget: QTableWidget, row_index: int):
-        """
-        Highlights the entire row in the QTableWidget.
+        Highlights the entire row in the QTableView.
         Args: row_index: The zero-based index of the row to highlight.
         """
-        table_widget.clearSelection()
+        table_view.clearSelection()
         # SelectionBehavior=SelectRows, so any col highlights the whole row (here, col 0 for convenience).
-        table_widget.setCurrentCell(row_index, 0)
-        # table_widget.scrollToItem(self.table_widget.item(row_index, 0))
+        table_view.setCurrentIndex(table_view.model().index(row_index, 0))
 
     def show_help_topic(self, sender_label: ClickableLabel):
         """Slot runs when label is clicked, accessing custom property."""
@@ -661,13 +759,13 @@ class Editor(QWidget):
         return authorised_to_continue
 
     def save_form_data(self) -> None:
-        csv_file = io.get_csv_file_name_and_path(self.settings)
-        io.write_to_csv(csv_file, self.data.excel_rows, self.data.headers)
-        io.write_data_to_excel(
-            [self.data.headers, *self.data.excel_rows], csv_file.with_suffix(".xlsx")
-        )
+        logic.save_changes(self.data, self.settings)
         self.data.all_text_is_saved = True
 
+    def save_all_changes(self) -> None:
+        ## ** rewrites the full .csv / .xlsx if anything is still only in the journal
+        logic.save_changes(self.data, self.settings, compact=True)
+
     def highlight_fields(self, field_names: list[str]) -> None:
         for input in self.inputs:
             if input.objectName() in field_names:
@@ -734,6 +832,19 @@ class Editor(QWidget):
     def go_to_next_record(self) -> None:
         self.update_current_position("forwards")
 
+    def handle_search(self) -> None:
+        """Each Enter jumps to the next matching record (wrapping round)"""
+        query = self.search_box.text()
+        if not query.strip():
+            return
+        matches = logic.search_records(self.data, query)
+        if not matches:
+            self.show_alert_box(f'No records match "{query}".')
+            return
+        self.go_to_record_number(
+            logic.get_next_match(matches, self.data.current_row_index)
+        )
+
     def go_to_record_number(self, record_number: int) -> None:
         self.update_current_position("exact", record_number)
 
@@ -858,7 +969,7 @@ class Editor(QWidget):
             self.update_input_styling(input_widget, "input_active")
         self.add_signal_to_fire_on_text_change()
         if self.settings.show_table_view:
-            self.load_table(self.tableView, self.data.excel_rows, self.data.headers)
+            self.show_table_state()
             self.highlight_row_by_index(self.tableView, self.data.current_row_index)
         mode = "lock" if row_to_load else "edit"
         self.toggle_record_editable(mode)
@@ -924,42 +1035,34 @@ class Editor(QWidget):
 
     def load_combo_box(self, combo_box: QComboBox, value="") -> None:
         """
-        The list of options is populated from the baseName() value
+        The list of options (a shared model, see build_combo_models) is chosen from the baseName() value
         If a record exists, a value is passed which is rendered as the correct display index
         otherwise, the default of -1 is set as the index
         """
         source = self.get_combo_options_source(combo_box)
-        raw_options = self.get_raw_combo_options(source)
-        options, index = self.get_normalized_combo_list(
-            combo_box.objectName(), raw_options, value
-        )
-        # print(f"load_combo_box {combo_box.objectName()} >>> {match_for_yaml_lookup=}: {value=}, {index=}, {options[:2]=}...\n")
-        combo_box.clear()
-        combo_box.addItems(options)
+        model, index_by_option = self.get_combo_model(source)
+        index = self.get_combo_index(combo_box.objectName(), model, index_by_option, value)
+        # print(f"load_combo_box {combo_box.objectName()} >>> {match_for_yaml_lookup=}: {value=}, {index=}...\n")
+        ## * the options only change with the source (e.g. a follower's leader)
+        if combo_box.model() is not model:
+            combo_box.setModel(model)
         combo_box.setCurrentIndex(index)
 
-    def load_table(self, table: QTableWidget, rows: list[list], headers=[]) -> None:
-        table.setEnabled(True)
-        if not headers:
-            headers = self.data.headers
+    def show_table_state(self) -> None:
+        """
+        The rows themselves come from the model (see RecordTableModel);
+        without records, the table is disabled & its single row spans the columns.
+        """
+        table = self.tableView
+        table.setEnabled(self.data.has_records)
+        table.clearSpans()
         if not self.data.has_records:
-            rows = [["" for _ in headers]]
-            table.setEnabled(False)
-        table.setColumnCount(len(rows[0]))
-        table.setRowCount(len(rows))
-        if headers:
-            table.setHorizontalHeaderLabels(headers)
-        if self.data.has_records:
-            for row_i, row in enumerate(rows):
-                for col_i, column in enumerate(row):
-                    table.setItem(row_i, col_i, QTableWidgetItem(column))
-                table.setRowHeight(row_i, 30)
-        else:
-            table.setSpan(0, 0, 1, len(self.data.headers))
-            empty_cell = QTableWidgetItem("no order items added yet")
-            table.setItem(0, 0, empty_cell)
-        table.cellClicked.connect(self.pass_table_row_index)
-        row_count = max(2, min(len(rows), 5))
+            table.setSpan(0, 0, 1, max(len(self.data.headers), 1))
+        self.fit_table_height()
+
+    def fit_table_height(self) -> None:
+        table = self.tableView
+        row_count = max(2, min(self.record_table.rowCount(), 5))
         row_height = 30  # or whatever you use for row height
         table.setMinimumHeight(
             row_count * row_height + table.horizontalHeader().height()
@@ -968,9 +1071,11 @@ class Editor(QWidget):
             row_count * row_height + table.horizontalHeader().height()
         )
 
-    def pass_table_row_index(self, row, column) -> None:
-        self.highlight_row_by_index(self.tableView, row)
-        self.go_to_record_number(row)
+    def pass_table_row_index(self, index: QModelIndex) -> None:
+        if not self.data.has_records:
+            return
+        self.highlight_row_by_index(self.tableView, index.row())
+        self.go_to_record_number(index.row())
 
     def load_line_edit(self, input_widget: QLineEdit, value="") -> None:
         input_widget.setText(value)
@@ -1061,34 +1166,92 @@ class Editor(QWidget):
         return msg
 
     def handle_marc_files(self) -> None:
+        """
+        The export runs on a worker thread (see MarcExportWorker)
+        behind a modal progress dialog which can cancel it.
+        """
         authorised_to_continue = logic.gatekeeper("marc", self)
         if not authorised_to_continue:
             return
+        self.save_all_changes()
         file_name_with_path = (
             self.settings.files.full_output_dir / self.settings.files.out_file
         )
-        rows_to_export = logic.remove_dummy_rows(
-            self.data.excel_rows, self.settings, self.COL
-        )
-        rows_to_export = logic.remove_empty_rows(
-            rows_to_export, self.settings, self.COL
+        ## * a snapshot: the rows can't change under the worker
+        rows = list(self.data.excel_rows)
+        ## * dummy & empty rows aren't built, so they don't count towards the total
+        record_total = logic.count_rows_for_export(rows, self.settings, self.COL)
+        dialog = QProgressDialog("Exporting records as MARC 21...", "Cancel", 0, record_total, self)
+        dialog.setWindowTitle("MARC 21 export")
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(0)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+
+        thread = QThread(self)
+        worker = MarcExportWorker(rows, file_name_with_path, self.settings, self.COL)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        ## * direct: the worker's own thread is busy exporting
+        dialog.canceled.connect(worker.cancel, Qt.ConnectionType.DirectConnection)
+        ## * bound to the editor, so these run on the GUI thread
+        worker.progress.connect(self.show_marc_export_progress)
+        worker.saved.connect(self.handle_marc_files_saved)
+        worker.cancelled.connect(self.handle_marc_export_cancelled)
+        worker.failed.connect(self.handle_marc_export_failed)
+        for signal in (worker.saved, worker.cancelled, worker.failed):
+            signal.connect(thread.quit)
+        thread.finished.connect(self.handle_marc_export_finished)
+        self.marc_export_dialog = dialog
+        self.marc_export_file = file_name_with_path
+        self.marc_export_started = time.monotonic()
+        ## * keep references until the thread has finished
+        self.marc_export_worker = worker
+        self.marc_export_thread = thread
+        thread.start()
+
+    def show_marc_export_progress(self, parsed: int, built: int, bytes_written: int) -> None:
+        dialog = self.marc_export_dialog
+        total = dialog.maximum()
+        elapsed = time.monotonic() - self.marc_export_started
+        eta = ""
+        if built and elapsed:
+            seconds_left = max(total - built, 0) * elapsed / built
+            eta = f"\nAbout {seconds_left:.0f}s left"
+        dialog.setLabelText(
+            f"{built} of {total} records built ({parsed} parsed, {bytes_written // 1024} KB written){eta}"
         )
-        rows_in_marc_format = logic.format_list_for_marc(rows_to_export, self.settings)
-        files_successfully_created = marc_21.save_as_marc_files(
-            self.data,
-            rows_in_marc_format,
-            file_name_with_path,
-            self.settings,
-        )
-        if files_successfully_created:
-            msg = f'The {len(rows_to_export)} records in "{self.settings.files.in_file}" have been successfully saved as "{file_name_with_path.stem}.mrk" in *{self.settings.files.full_output_dir}*.'
-        else:
-            msg = "Not all files were successfully created."
+        dialog.setValue(min(built, total))
+
+    def handle_marc_export_finished(self) -> None:
+        """Each export makes its own dialog, worker & thread: free them once the thread has stopped"""
+        for qt_object in (self.marc_export_dialog, self.marc_export_worker, self.marc_export_thread):
+            qt_object.deleteLater()
+
+    def handle_marc_files_saved(self, record_count: int, skipped: str) -> None:
+        self.marc_export_dialog.close()
+        msg = f'The {record_count} records in "{self.settings.files.in_file}" have been successfully saved as "{self.marc_export_file.stem}.mrk" in *{self.settings.files.full_output_dir}*. {skipped}'.rstrip()
+        logger.info(msg)
+        msg_box = QMessageBox()
+        msg_box.setText(msg)
+        msg_box.exec()
+
+    def handle_marc_export_cancelled(self) -> None:
+        self.marc_export_dialog.close()
+        msg = "The MARC 21 export was cancelled; no files were saved."
         logger.info(msg)
         msg_box = QMessageBox()
         msg_box.setText(msg)
         msg_box.exec()
 
+    def handle_marc_export_failed(self, error: str) -> None:
+        self.marc_export_dialog.close()
+        msg = f"The MARC 21 export failed ({error}); no files were saved."
+        logger.warning(msg)
+        msg_box = QMessageBox()
+        msg_box.setText(msg)
+        msg_box.exec()
+
     def choose_to_save_on_barcode(self) -> None:
         if (
             self.data.record_is_locked
@@ -1156,8 +1319,13 @@ class Editor(QWidget):
                 Path(file_path), self.settings.first_row_is_header
             )
             if logic.is_expected_filetype(tmp_headers, self.COL):
-                self.data.headers = tmp_headers
-                self.data.excel_rows = tmp_excel_rows
+                self.save_all_changes()
+                logic.reset_save_state(self.data, file_path, len(tmp_excel_rows))
+                with self.record_table.resetting():
+                    self.data.headers = tmp_headers
+                    self.data.excel_rows = tmp_excel_rows
+                    self.data.has_records = True
+                    self.data.search_index = search.build_search_index(tmp_excel_rows)
                 self.settings.files.in_file = file_path.name
                 self.settings.files.out_file = io.get_base_filename(file_path)
             else:
@@ -1172,7 +1340,6 @@ class Editor(QWidget):
                 f"\n** file dialog -> records loaded: {len(self.data.excel_rows)}"
             )
             self.data.all_text_is_saved = True
-            self.data.has_records = True
             if self.settings.show_marc_button:
                 self.marc_btn.setEnabled(True)
             self.go_to_last_record()
@@ -1191,6 +1358,62 @@ class Editor(QWidget):
         return False
 
 
+class MarcExportWorker(QObject):
+    """
+    Runs logic.export_rows_as_marc() on a QThread, so the window stays responsive.
+    Progress is signalled at most every PROGRESS_INTERVAL seconds;
+    cancel() stops the export between records, leaving no files behind.
+    """
+
+    PROGRESS_INTERVAL = 0.1
+
+    progress = Signal(int, int, int)  # records parsed, records built, bytes written
+    saved = Signal(int, str)  # records saved, rows left out (see logic.describe_skipped_rows)
+    cancelled = Signal()
+    failed = Signal(str)
+
+    def __init__(self, rows: list[list[str]], file_name_with_path: Path, settings: Default_settings, COL) -> None:
+        super().__init__()
+        self.rows = rows
+        self.file_name_with_path = file_name_with_path
+        self.settings = settings
+        self.COL = COL
+        self.cancel_requested = threading.Event()
+        self.last_reported = 0.0
+
+    def run(self) -> None:
+        from . import marc_21
+
+        try:
+            record_count, skipped = logic.export_rows_as_marc(
+                self.rows,
+                self.file_name_with_path,
+                self.settings,
+                self.COL,
+                self.report_progress,
+                self.cancel_requested.is_set,
+            )
+        except marc_21.ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            logger.exception("The MARC 21 export failed")
+            self.failed.emit(str(e))
+        else:
+            self.saved.emit(record_count, logic.describe_skipped_rows(skipped))
+
+    def report_progress(self, progress: "marc_21.ExportProgress") -> None:
+        now = time.monotonic()
+        if now - self.last_reported < self.PROGRESS_INTERVAL:
+            return
+        self.last_reported = now
+        self.progress.emit(
+            progress.records_parsed, progress.records_built, progress.bytes_written
+        )
+
+    def cancel(self) -> None:
+        self.cancel_requested.set()
+
+
 class DialogueOkCancel(QDialog):
     def __init__(self, parent, text):
         super().__init__(parent)
@@ -1386,8 +1609,11 @@ def setup_environment(settings: Default_settings) -> tuple:
 
     # logic.show_col(COL)
     if settings.combos.data_file:
-        settings.combos.data = io.open_yaml_file(
-            settings.files.app_dir / settings.combos.data_file
+        ## * compiled & cached next to the yaml file until it changes
+        settings.combos.data = io.load_compiled_yaml(
+            settings.files.app_dir / settings.combos.data_file,
+            logic.compile_combo_data,
+            logic.COMBO_DATA_VERSION,
         )
     # print(f"setup_environ: {len(rows)=}, {len(rows[0])=}, {headers=}")
     return (grid, rows, headers, COL)
@@ -1416,8 +1642,13 @@ def get_file_pattern_and_name_from_user(
     return (False, 0, "")
 
 
-def run(settings: Default_settings):
+def run(settings: Default_settings, recovery_report=""):
     app = QApplication(sys.argv)
+    if recovery_report:
+        ## * before a file is chosen, so the user knows which file holds their restored changes
+        msg_box = QMessageBox()
+        msg_box.setText(recovery_report)
+        msg_box.exec()
     grid, rows, headers, COL = setup_environment(settings)
     window = WindowWithRightTogglePanel(grid, rows, settings, headers, COL, app)
     window.show()
@@ -4,26 +4,37 @@ does NOT handle specific marc_21 marc files or excel io
 (These are currently still within marc_21.py)
 """
 
-from tkinter import W
-import yaml
 from pathlib import Path
 import csv
-import openpyxl  # type: ignore
-import openpyxl.styles
-from openpyxl.worksheet.worksheet import Worksheet  # type: ignore
-from openpyxl.workbook.defined_name import DefinedName
-from openpyxl.utils import quote_sheetname, absolute_coordinate
+import json
+import marshal
+import os
+from contextlib import contextmanager
 from datetime import date
 import logging
 import re
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any, TYPE_CHECKING
+from functools import cache
 
 from art_cats.settings import Default_settings
 
+if TYPE_CHECKING:
+    from openpyxl.worksheet.worksheet import Worksheet  # type: ignore
+
 logger = logging.getLogger(__name__)
 
 EXCEL_ESCAPE_RE = re.compile(r"_x([0-9a-fA-F]{4})_")
 
 
+@cache
+def get_yaml_loader():
+    """The safe loader, using libyaml (C) when pyyaml was built with it: ~10x faster"""
+    import yaml
+
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
 def get_base_filename(filepath: Path) -> str:
     base = f"{filepath.stem}.new{filepath.suffix}"
     # print(f"{filepath.stem=}, {filepath.suffix=}")
@@ -31,6 +42,8 @@ def get_base_filename(filepath: Path) -> str:
 
 
 def save_as_yaml(file: str, data) -> None:
+    import yaml
+
     with open(file, mode="wt", encoding="utf-8") as f:
         yaml.dump(data, f, sort_keys=False)
 
@@ -40,8 +53,42 @@ def open_yaml_file(file_path: Path):
     # with open(file, mode="rt", encoding="utf-8") as f:
     # file_path = settings.files.app_dir / Path(file)
     # file_path = Path(file)
+    import yaml
+
     with open(file_path, mode="rt", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=get_yaml_loader())
+
+
+def load_compiled_yaml(
+    yaml_file: Path, compile_data: Callable[[Any], Any], version: int = 1
+) -> Any:
+    """
+    The compiled form of the yaml data is kept (marshalled) in an .idx file next to it
+    & only rebuilt when the yaml file, the compiler or its version changes:
+    parsing yaml is slow, loading the index is not.
+    'compile_data' must return plain python types (dict, list, tuple, str, int...);
+    bump 'version' whenever what it returns changes.
+    """
+    index_file = yaml_file.with_suffix(".idx")
+    stamp = {
+        **get_file_stamp(yaml_file),
+        "compiled_by": f"{compile_data.__module__}.{compile_data.__qualname__}",
+        "version": version,
+    }
+    try:
+        with open(index_file, "rb") as f:
+            saved_stamp, compiled = marshal.load(f)
+        if saved_stamp == stamp:
+            return compiled
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    compiled = compile_data(open_yaml_file(yaml_file))
+    try:
+        with open_for_atomic_write(index_file, "wb") as f:
+            marshal.dump((stamp, compiled), f)
+    except OSError as e:
+        logger.info(f"The index {index_file} could not be saved ({e}); it will be rebuilt next time.")
+    return compiled
 
 
 def load_plaintext_from_file(file_name: str) -> str:
@@ -57,14 +104,88 @@ def load_plaintext_from_file(file_name: str) -> str:
         return f"<h1>Help File Not Found</h1><p>Please create a file named '<b>{file_name}</b>' in the current directory.</p>"
 
 
+@contextmanager
+def open_for_atomic_write(file_path: Path, mode="w", sync=False, **open_kwargs) -> Iterator[Any]:
+    """
+    Opens a temporary file next to file_path which replaces it once the block completes,
+    so a crash or an error part-way through never leaves a truncated file behind
+    ('sync' gets the data onto the disk before the replace)
+    """
+    tmp_file = file_path.with_name(f"{file_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, mode, **open_kwargs) as f:
+            yield f
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_file, file_path)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+
+
 def write_to_csv(file_name: Path, data: list[list[str]], headers: list[str]) -> None:
     logger.info(f"Exporting records as csv to {file_name}")
-    with open(file_name, "w", newline="", encoding="utf-8") as f:
+    with open_for_atomic_write(file_name, newline="", encoding="utf-8", sync=True) as f:
         csvwriter = csv.writer(f)
         csvwriter.writerow(headers)
         csvwriter.writerows(data)
 
 
+def start_journal(journal_file: Path, header: dict) -> None:
+    """
+    (Re)starts the journal with a checkpoint header
+    """
+    with open_for_atomic_write(journal_file, encoding="utf-8", sync=True) as f:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+
+
+def append_to_journal(journal_file: Path, entries: list[dict], sync=False) -> None:
+    """
+    The journal holds one json object per line, e.g.
+    {"op": "update", "row": 3, "values": ["...", ...]}
+    'sync' forces the lines onto the disk before returning.
+    """
+    with open(journal_file, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def read_journal(journal_file: Path) -> list[dict]:
+    entries: list[dict] = []
+    if not journal_file.exists():
+        return entries
+    with open(journal_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                ## only the last line can be torn (by a crash mid-write) & that change was never applied
+                logger.warning(f"Ignoring an incomplete entry at the end of {journal_file}.")
+                break
+    return entries
+
+
+def clear_journal(journal_file: Path) -> None:
+    journal_file.unlink(missing_ok=True)
+
+
+def get_file_stamp(file_path: Path) -> dict:
+    """Size & modification time: enough to tell if a file has been rewritten since"""
+    if not file_path.is_file():
+        return {}
+    stat = file_path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def get_journal_file_name_and_path(live_settings: Default_settings) -> Path:
+    return live_settings.files.full_output_dir / live_settings.files.backup_file
+
+
 def get_csv_file_name_and_path(live_settings: Default_settings) -> Path:
     csv_file = (
         live_settings.files.full_output_dir / f"{live_settings.files.out_file}.csv"
@@ -74,26 +195,21 @@ def get_csv_file_name_and_path(live_settings: Default_settings) -> Path:
     return csv_file
 
 
-def extract_from_excel(excel_sheet, first_row_is_header:bool) -> tuple[list[str], list[list[str]]]:
+def iter_rows_from_excel(excel_sheet) -> Iterator[list[str]]:
     """
     excel seems pretty random in how it assigns string/int/float, so...
     this routine coerces everything into a string,
     strips ".0" from misrecognised floats
     & removes trailing spaces
     """
-    sheet = []
-    headers = []
-    for i, excel_row in enumerate(excel_sheet.iter_rows(min_row=1, values_only=True)):
+    for excel_row in excel_sheet.iter_rows(min_row=1, values_only=True):
         if not excel_row[0] and not excel_row[1]:
             break  ## needed as openpyxl adds empty rows at the end
-        row = normalize_row(excel_row)
-        if is_empty_row(row):
-            continue
-        if i == 0 and first_row_is_header:
-            headers = row
-        else:
-            sheet.append(row)
-    return (headers, sheet)
+        yield normalize_row(excel_row)
+
+
+def extract_from_excel(excel_sheet, first_row_is_header:bool) -> tuple[list[str], list[list[str]]]:
+    return split_headers_from_rows(iter_rows_from_excel(excel_sheet), first_row_is_header)
 
 
 # def normalize_row(row: list) -> list:
@@ -108,19 +224,41 @@ def extract_from_excel(excel_sheet, first_row_is_header:bool) -> tuple[list[str]
 #     return clean_row
 
 
-def normalize_row(row: list) -> list:
+class CleanRow(list):
+    """
+    A row, as loaded, with nothing in it for logic.clean_cell_for_marc to decode or sanitise.
+    Rows edited in the GUI are replaced by plain lists, so they lose the flag.
+    """
+
+    __slots__ = ()
+
+
+def normalize_row(row: Iterable) -> list[str]:
+    """
+    Only the cheap clean-up is done on load: cells are coerced into strings,
+    stripped & mistaken decimals trimmed.
+    The values are left as the user typed them (newlines, tabs...):
+    control characters are only sanitised as a row is exported (see logic.clean_cell_for_marc),
+    & a row with none is returned as a CleanRow, so export can skip it.
+    """
     clean_row = []
     for cell in row:
         if cell:
             data = str(cell).strip()
-            cell, _ = decode_excel_escapes(cell)
             data = trim_mistaken_decimals(data)
         else:
             data = ""
         clean_row.append(data)
+    if all(is_clean_cell(cell) for cell in clean_row):
+        return CleanRow(clean_row)
     return clean_row
 
 
+def is_clean_cell(text: str) -> bool:
+    """No control characters & no _xNNNN_ escapes (nothing for decode_excel_escapes to match)"""
+    return text.isprintable() and "_x" not in text
+
+
 def decode_excel_escapes(text: str) -> tuple[str, int]:
     """
     decodes Excel-style _xNNNN_ escape sequences (for example _x000D_) into the actual Unicode character they represent
@@ -142,43 +280,107 @@ def decode_excel_escapes(text: str) -> tuple[str, int]:
     return EXCEL_ESCAPE_RE.sub(repl, text), replaced_count
 
 
+## * tabs become 4 spaces; Windows & Unix line endings and the BOM (Windows UTF‑8-with-BOM) are removed
+SANITIZE_TABLE = str.maketrans({"\t": "    ", "\n": None, "\r": None, "\ufeff": None})
+SANITIZE_COUNTED = {"tabs": "\t", "newlines": "\n", "returns": "\r", "bom": "\ufeff"}
+
+
+## * ALL other control and format chars: unicode categories Cc & Cf (as of unicode 15.0)
+CONTROL_CHARS_RE = re.compile(
+    r"[\x00-\x1f\x7f-\x9f\xad\u0600-\u0605\u061c\u06dd\u070f\u0890-\u0891\u08e2\u180e"
+    r"\u200b-\u200f\u202a-\u202e\u2060-\u2064\u2066-\u206f\ufeff\ufff9-\ufffb"
+    r"\U000110bd\U000110cd\U00013430-\U0001343f\U0001bca0-\U0001bca3\U0001d173-\U0001d17a"
+    r"\U000e0001\U000e0020-\U000e007f]"
+)
+
+
+def sanitize_string(text: str) -> tuple[str, str]:
+    """
+    Returns the cleaned text & details of what was changed ("" if nothing).
+    Clean text (the usual case) is returned as is without being walked character by character.
+    """
+    if not text or text.isprintable():
+        return (text, "")
+    if not CONTROL_CHARS_RE.search(text):
+        ## * e.g. a no-break space: not printable, but nothing to remove
+        return (text, "")
+    chars_removed = {
+        name: text.count(char) for name, char in SANITIZE_COUNTED.items()
+    }
+    cleaned, chars_removed["controls"] = CONTROL_CHARS_RE.subn(
+        "", text.translate(SANITIZE_TABLE)
+    )
+    count = sum(chars_removed.values())
+    details = ", ".join([f"{k}: {v}" for k, v in chars_removed.items() if v])
+    details = f"{count} invalid characters changed or removed: {details}"
+    return cleaned, details
+
+
 def trim_mistaken_decimals(value: str) -> str:
     if value.endswith(".0"):
         value = value[:-2]
     return value
 
 
+def iter_rows_from_file(file_path: Path) -> Iterator[list[str]]:
+    """
+    Yields the normalised, non-empty rows of a .csv / .tsv / Excel file one at a time
+    (the header row, if any, is simply the first row yielded).
+    Excel files are opened in read-only mode & csv files are read lazily,
+    so memory use does not grow with the size of the file.
+    """
+    is_excel_file = file_path.suffix.startswith(".xl")
+    if is_excel_file:
+        import openpyxl  # type: ignore
+
+        workbook = openpyxl.load_workbook(
+            filename=str(file_path.resolve()), read_only=True
+        )
+        try:
+            rows = iter_rows_from_excel(workbook.active)
+            yield from (row for row in rows if not is_empty_row(row))
+        finally:
+            workbook.close()  ## read-only workbooks keep the file open until closed
+    else:
+        delimiter = "," if file_path.suffix == ".csv" else "\t"
+        with open(file_path.resolve(), mode="r", encoding="utf-8") as csv_file:
+            for row in csv.reader(csv_file, delimiter=delimiter):
+                row = normalize_row(row)
+                if not is_empty_row(row):
+                    yield row
+
+
+def split_headers_from_rows(
+    rows: Iterable[list[str]], first_row_is_header: bool
+) -> tuple[list[str], list[list[str]]]:
+    headers = []
+    _rows = iter(rows)
+    if first_row_is_header:
+        headers = next(_rows, [])
+    return (headers, list(_rows))
+
+
 def parse_file_into_rows(
     file_path: Path,
     first_row_is_header
 ) -> tuple[list[str], list[list[str]]]:
-    is_excel_file = file_path.suffix.startswith(".xl")
-    if is_excel_file:
-        excel_file_name = str(file_path.resolve())
-        worksheet = openpyxl.load_workbook(filename=excel_file_name).active
-        headers, raw_rows = extract_from_excel(worksheet, first_row_is_header)
-    else:
-        headers, raw_rows = extract_from_csv(file_path, first_row_is_header)
+    headers, raw_rows = stream_file_into_rows(file_path, first_row_is_header)
+    return (headers, list(raw_rows))
+
+
+def stream_file_into_rows(
+    file_path: Path, first_row_is_header
+) -> tuple[list[str], Iterator[list[str]]]:
+    """As parse_file_into_rows(), but the rows are only read as they are consumed"""
+    raw_rows = iter_rows_from_file(file_path)
+    headers = next(raw_rows, []) if first_row_is_header else []
     #* strip out any tabs or newlines
     headers = [re.sub(r"\s+", " ", header) for header in headers]
     return (headers, raw_rows)
 
 
 def extract_from_csv(file_address: Path, first_row_is_header) -> tuple[list[str], list[list[str]]]:
-    sheet = []
-    headers = []
-    delimiter = "," if file_address.suffix == ".csv" else "\t"
-    with open(file_address.resolve(), mode="r", encoding="utf-8") as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=delimiter)
-        for i, row in enumerate(csv_reader):
-            row = normalize_row(row)
-            if is_empty_row(row):
-                continue
-            if i == 0 and first_row_is_header:
-                headers = row
-            else:
-                sheet.append(row)
-    return (headers, sheet)
+    return split_headers_from_rows(iter_rows_from_file(file_address), first_row_is_header)
 
 
 def is_empty_row(row:list[str]) -> bool:
@@ -193,10 +395,15 @@ def write_CHU_file(
     """
     Write out CHU file, including formatting (for the craic)
     """
+    import openpyxl  # type: ignore
+    import openpyxl.styles
+    from openpyxl.workbook.defined_name import DefinedName
+    from openpyxl.utils import quote_sheetname, absolute_coordinate
+
     chu_file = file_name.with_name(f"holdingsupdate-{file_name.name}")
     chu_file = chu_file.with_suffix(".xlsx")
     wb = openpyxl.Workbook()
-    ws: Worksheet = wb.active  # type: ignore
+    ws: "Worksheet" = wb.active  # type: ignore
     ws.title = "Recorded data"
     dark_blue = "24069B"
     lighter_dark_blue = "366092"
@@ -285,8 +492,9 @@ def write_CHU_file(
             cell.alignment = openpyxl.styles.Alignment(horizontal="left")
             cell.font = openpyxl.styles.Font(name="Arial", bold=False, size=10)
         ws.row_dimensions[row_count].height = default_row_height  # Height in points
+    with open_for_atomic_write(chu_file, "wb") as f:
+        wb.save(f)
     logger.info(f"CHU file ({chu_file}) successfully written.")
-    wb.save(chu_file)
 
 
 def write_data_to_excel(
@@ -311,9 +519,11 @@ def write_data_to_excel(
         return
 
     # 1. Create a new Workbook and get the active worksheet
+    import openpyxl  # type: ignore
+
     try:
         workbook = openpyxl.Workbook()
-        sheet: Worksheet = workbook.active # type: ignore
+        sheet: "Worksheet" = workbook.active # type: ignore
         sheet.title = sheet_name
 
         # 2. Iterate through the rows in the data structure
@@ -330,7 +540,8 @@ def write_data_to_excel(
                 sheet.cell(row=excel_row_num, column=excel_col_num, value=cell_value)
 
         # 4. Save the Workbook
-        workbook.save(filename)
+        with open_for_atomic_write(Path(filename), "wb") as f:
+            workbook.save(f)
         logger.info(f"Successfully wrote data to '{filename}' on sheet '{sheet_name}'.")
 
     except Exception as e:
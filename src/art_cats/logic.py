@@ -1,4 +1,7 @@
-from dataclasses import dataclass, fields
+from dataclasses import dataclass, field, fields
+from collections.abc import Callable, Iterable, Iterator
+from functools import cache
+from typing import TypeAlias, TYPE_CHECKING
 
 # from tkinter import W
 from pathlib import Path
@@ -8,10 +11,16 @@ from re import I, subn
 from art_cats.settings import Default_settings
 from . import validation
 from . import io
-from . import marc_21
+from . import search
 import logging
 from enum import Enum
-import unicodedata
+import bisect
+import csv
+import sys
+import zipfile
+
+if TYPE_CHECKING:
+    from . import marc_21
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +60,12 @@ class Data:
     record_is_locked = False
     all_text_is_saved = True
     form_has_been_cleared = False
+    ## * incremental saving: changes are journalled against the last file written in full (the checkpoint)
+    checkpoint_file = ""
+    rows_in_checkpoint = 0
+    changes_since_checkpoint = 0
+    journal_is_open = False
+    search_index = search.SearchIndex()
 
     @property
     def row_count(self) -> int:
@@ -82,7 +97,7 @@ class Data:
 
 
 def initialise_data(
-    excel_rows: list[list[str]], column_count: int, headers: list[str]
+    excel_rows: list[list[str]], column_count: int, headers: list[str], source_file=""
 ) -> Data:
     data = Data()
     data.headers = headers
@@ -92,9 +107,31 @@ def initialise_data(
     else:
         data.excel_rows = [["" for _ in range(column_count)]]
         data.has_records = False
+    data.search_index = search.build_search_index(excel_rows)
+    reset_save_state(data, source_file, len(excel_rows))
     return data
 
 
+def reset_save_state(data: Data, checkpoint_file="", rows_in_checkpoint=0) -> None:
+    data.checkpoint_file = str(checkpoint_file)
+    data.rows_in_checkpoint = rows_in_checkpoint
+    data.changes_since_checkpoint = 0
+    data.journal_is_open = False
+
+
+def search_records(data: Data, query: str) -> list[int]:
+    """The indices of the records matching query (see search.search)"""
+    if not data.has_records:
+        return []
+    return search.search(data.search_index, query)
+
+
+def get_next_match(matches: list[int], current_row_index: int) -> int:
+    """The first match after the current record, wrapping round to the start"""
+    i = bisect.bisect_right(matches, current_row_index)
+    return matches[i % len(matches)]
+
+
 def get_new_current_row_index(data:Data, direction:str, record_number:int) -> int:
     new_index = data.current_row_index
     match direction:
@@ -106,7 +143,7 @@ def get_new_current_row_index(data:Data, direction:str, record_number:int) -> in
             if new_index > 0:
                 new_index -= 1
         case "exact" if record_number >= 0:
-            if record_number < data.column_count:
+            if record_number < data.record_count:
                 new_index = record_number
         case _:
             if new_index < data.index_of_last_record:
@@ -114,6 +151,47 @@ def get_new_current_row_index(data:Data, direction:str, record_number:int) -> in
     return new_index
 
 
+## * bump when compile_combo_data()'s output changes (see io.load_compiled_yaml)
+COMBO_DATA_VERSION = 2
+MISSING_COMBO_OPTIONS = "<missing data>"
+
+## * a combo box's options, as shown, & the index of each option in them
+ComboOptions: TypeAlias = tuple[list[str], dict[str, int]]
+
+
+def compile_combo_data(raw_data: dict | None) -> dict[str, ComboOptions]:
+    """
+    The combo data (see io.load_compiled_yaml) as ready-made tables:
+    combo name / leader option -> its options as shown (see compile_combo_options)
+    """
+    return {
+        str(key): compile_combo_options(
+            [str(option) for option in options or [] if option is not None]
+        )
+        for key, options in (raw_data or {}).items()
+    }
+
+
+def compile_combo_options(
+    raw_options: list[str], default_text: str = Default_settings.combos.default_text
+) -> ComboOptions:
+    """
+    With more than one option, the instruction to choose one comes first;
+    a single option is simply selected.
+    Each option is indexed by its first position.
+    """
+    if not raw_options:
+        options = [MISSING_COMBO_OPTIONS]
+    elif len(raw_options) == 1:
+        options = list(raw_options)
+    else:
+        options = [default_text, *raw_options]
+    index_by_option: dict[str, int] = {}
+    for index, option in enumerate(options):
+        index_by_option.setdefault(option, index)
+    return (options, index_by_option)
+
+
 def get_fields_to_clear(settings:Default_settings, COL) -> list:
     if (
         settings.validation.clear_all_fields
@@ -248,16 +326,28 @@ def add_record(editor, record_as_dict) -> None:
     # print(f"OK... data passes as valid for submission...{record_as_data_row}")
     if editor.data.current_record_is_new:
         # print(f"***{self.has_records=}, record count: {self.record_count} {data=}")
+        new_index = editor.data.record_count if editor.data.has_records else 0
+        log_change(editor, "add", new_index, record_as_data_row)
         if editor.data.has_records:
-            editor.data.excel_rows.append(record_as_data_row)
+            with editor.record_table.inserting_rows(new_index, new_index):
+                editor.data.excel_rows.append(record_as_data_row)
+            search.index_row(editor.data.search_index, new_index, record_as_data_row)
         else:
             editor.data.excel_rows = [record_as_data_row]
             editor.data.has_records = True
+            editor.data.search_index = search.build_search_index(editor.data.excel_rows)
+            ## * the table's placeholder row becomes the first record
+            editor.record_table.rows_changed(0)
         editor.data.current_row_index = editor.data.index_of_last_record
         editor.update_title_with_record_number()
     else:
         ## Update existing record
+        log_change(editor, "update", editor.data.current_row_index, record_as_data_row)
         editor.data.current_row = record_as_data_row
+        search.index_row(
+            editor.data.search_index, editor.data.current_row_index, record_as_data_row
+        )
+        editor.record_table.rows_changed(editor.data.current_row_index)
 
 
 # def save_record_externally(editor) -> None:
@@ -271,7 +361,10 @@ def add_record(editor, record_as_dict) -> None:
 def delete_record(editor, index=-1) -> None:
     if index == -1:
         index = editor.data.current_row_index
-    del editor.data.excel_rows[index]
+    log_change(editor, "delete", index)
+    with editor.record_table.removing_rows(index, index):
+        del editor.data.excel_rows[index]
+    search.unindex_row(editor.data.search_index, index)
     index_of_last_record = editor.data.index_of_last_record
     if index > index_of_last_record:
         index = index_of_last_record
@@ -281,6 +374,122 @@ def delete_record(editor, index=-1) -> None:
         editor.load_record_into_gui(editor.data.excel_rows[index])
 
 
+def log_change(editor, op: str, index: int, row: list | None = None) -> None:
+    """
+    Write-ahead: each change is fsync'd to the journal *before* it is applied to the records,
+    so a submit is durable without rewriting the whole file.
+    """
+    data: Data = editor.data
+    journal_file = io.get_journal_file_name_and_path(editor.settings)
+    if not data.journal_is_open:
+        io.start_journal(journal_file, get_checkpoint_header(data, editor.settings))
+        data.journal_is_open = True
+    io.append_to_journal(
+        journal_file, [{"op": op, "row": index, "values": row}], sync=True
+    )
+    data.changes_since_checkpoint += 1
+
+
+def get_checkpoint_header(data: Data, live_settings: Default_settings) -> dict:
+    return {
+        "op": "checkpoint",
+        "file": data.checkpoint_file,
+        "stamp": (
+            io.get_file_stamp(Path(data.checkpoint_file)) if data.checkpoint_file else {}
+        ),
+        "rows": data.rows_in_checkpoint,
+        "first_row_is_header": live_settings.first_row_is_header,
+        "headers": data.headers,
+        "target": str(io.get_csv_file_name_and_path(live_settings)),
+    }
+
+
+def replay_journal(rows: list[list[str]], changes: list[dict]) -> list[list[str]]:
+    for change in changes:
+        match change["op"]:
+            case "add":
+                rows.insert(change["row"], change["values"])
+            case "update":
+                rows[change["row"]] = change["values"]
+            case "delete":
+                del rows[change["row"]]
+            case _:
+                logger.warning(f"Unknown journal entry skipped: {change}")
+    return rows
+
+
+def save_changes(data: Data, live_settings: Default_settings, compact=False) -> None:
+    """
+    The changes themselves are already safe in the journal (see log_change()),
+    so saving only has to rewrite the full .csv & .xlsx (a new checkpoint)
+    after settings.compact_after_changes changes, or when 'compact' is requested (export / close).
+    """
+    if not data.changes_since_checkpoint:
+        return
+    if compact or data.changes_since_checkpoint >= live_settings.compact_after_changes:
+        compact_saved_data(data, live_settings)
+
+
+def compact_saved_data(data: Data, live_settings: Default_settings) -> None:
+    csv_file = io.get_csv_file_name_and_path(live_settings)
+    rows = data.excel_rows if data.has_records else []
+    io.write_to_csv(csv_file, rows, data.headers)
+    io.write_data_to_excel([data.headers, *rows], csv_file.with_suffix(".xlsx"))
+    reset_save_state(data, csv_file, len(rows))
+    io.start_journal(
+        io.get_journal_file_name_and_path(live_settings),
+        get_checkpoint_header(data, live_settings),
+    )
+    data.journal_is_open = True
+
+
+## * a journal or checkpoint that can't be read: a missing key, a bad row number, a corrupt csv / xlsx...
+JOURNAL_ERRORS = (KeyError, IndexError, TypeError, ValueError, csv.Error, zipfile.BadZipFile)
+
+
+def recover_from_journal(live_settings: Default_settings) -> str:
+    """
+    A journal holding changes at startup means the last session did not shut down cleanly:
+    the changes are replayed onto the checkpoint they were logged against
+    and written to the file that session was saving to.
+    Recovery time depends on the length of the journal, not the size of the data.
+    A journal that can't be replayed is moved aside (*.bad) so the app can still start.
+    Returns what happened, to tell the user ("" if there was nothing to recover).
+    """
+    journal_file = io.get_journal_file_name_and_path(live_settings)
+    entries = io.read_journal(journal_file)
+    if len(entries) < 2:
+        return ""
+    try:
+        msg = replay_journal_into_target(journal_file, entries[0], entries[1:])
+    except JOURNAL_ERRORS as e:
+        bad_journal = journal_file.with_suffix(".bad")
+        journal_file.replace(bad_journal)
+        msg = f"The unsaved changes of the last session could not be recovered ({e!r}). The journal has been kept as {bad_journal}."
+    logger.warning(msg)
+    return msg
+
+
+def replay_journal_into_target(journal_file: Path, header: dict, changes: list[dict]) -> str:
+    rows: list[list[str]] = []
+    if header["file"]:
+        checkpoint_file = Path(header["file"])
+        if io.get_file_stamp(checkpoint_file) != header["stamp"]:
+            stale_journal = journal_file.with_suffix(".stale")
+            journal_file.replace(stale_journal)
+            return f"{checkpoint_file} has changed since the unsaved changes were journalled, so they cannot be replayed safely. The journal has been kept as {stale_journal}."
+        _, rows = io.parse_file_into_rows(
+            checkpoint_file, header["first_row_is_header"]
+        )
+        rows = rows[: header["rows"]]
+    rows = replay_journal(rows, changes)
+    target = Path(header["target"])
+    io.write_to_csv(target, rows, header["headers"])
+    io.write_data_to_excel([header["headers"], *rows], target.with_suffix(".xlsx"))
+    io.clear_journal(journal_file)
+    return f"The last session did not close cleanly: {len(changes)} unsaved change{singular_or_plural(len(changes))} recovered into {target}."
+
+
 def is_expected_filetype(headers, col_enum):
     expected_col_count = len(col_enum)
     file_resembles_expectations = len(headers) == expected_col_count
@@ -368,12 +577,11 @@ def map_fits_list(mappings: list, orig: list) -> bool:
 def format_list_for_marc(
     records: list[list[str]], live_settings: Default_settings
 ) -> list[list[str]]:
-    """
-    Makes sure the record contains the correct information in the correct order:
-    1) makes order of fields match marc standard
-    2) supplies marc-internal fields with empty strings to be expanded later
-    """
-    internal_fields = {
+    return list(iter_rows_formatted_for_marc(records, live_settings))
+
+
+MARC_INTERNAL_FIELDS = frozenset(
+    {
         "id",
         "state",
         "country_code",
@@ -383,102 +591,97 @@ def format_list_for_marc(
         "sequence_number",
         "links",
     }
-    marc_column_names = [
-        f.name for f in fields(marc_21.Record) if f.name not in internal_fields
-    ]
-    augmented_records = []
-    must_normalise_column_order = bool(live_settings.csv_to_marc_mappings)
+)
+
+## * for each Record slot (internal fields excepted), the source column it's read from (None = empty)
+ColumnProjection: TypeAlias = tuple[int | None, ...]
+
+
+def iter_rows_formatted_for_marc(
+    records: Iterable[list[str]], live_settings: Default_settings
+) -> Iterator[list[str]]:
+    """
+    Makes sure the record contains the correct information in the correct order:
+    1) makes order of fields match marc standard
+    2) supplies marc-internal fields with empty strings to be expanded later
+    Each row is projected through a projection compiled once for the pattern
+    (with any corrective column mapping folded in).
+    The cells of rows flagged as clean on load (io.CleanRow) are copied as they are.
+    """
+    mappings = live_settings.csv_to_marc_mappings
+    column_names = tuple(live_settings.column_names)
+    projection = get_marc_column_projection(column_names)
+    mapped_projection = (
+        get_mapped_marc_column_projection(column_names, tuple(mappings)) if mappings else None
+    )
+    must_normalise_column_order = bool(mappings)
     if must_normalise_column_order:
         logger.info("Normalising columns to match expected order.")
     for record_num, record in enumerate(records):
+        row_is_clean = isinstance(record, io.CleanRow)
         # * apply corrective column mapping if necessary
-        if must_normalise_column_order:
-            record = map_list(record, live_settings.csv_to_marc_mappings)
-        curr_row = []
-        _col = iter(record)
-        # print(f"Record number {record_num + 1}:")
-        for i, marc_col_name in enumerate(marc_column_names):
-            # removed_count = 0
-            # removed_chars = []
-            details = ""
-            if marc_col_name in live_settings.column_names:
-                contents = next(_col)
-                if isinstance(contents, str):
-                    # contents = remove_problematic_characters(record_num, marc_col_name, contents)
-                    # contents, removed_count, removed_chars = sanitize_string(contents)
-                    contents, _ = io.decode_excel_escapes(contents)
-                    contents, details = sanitize_string(contents)
-            else:
-                contents = ""
-            # if removed_count:
-            #     logging.warning(f"Record {record_num + 1}: {removed_count} invalid character{singular_or_plural(removed_count)} ({", ".join(removed_chars)}) found and replaced in field '{marc_col_name}'.")
-            if details:
-                logging.warning(f"In record {record_num + 1}, {details}")
-            # print(f"\t{i} {marc_col_name}: {contents=}")
-            curr_row.append(contents)
-
-        augmented_records.append(curr_row)
-
-    # print("** format list for marc:")
-    # print(f"{len(augmented_records[1])}->{augmented_records[1]}")
-    # print(f"{len(marc_column_names)}->{marc_column_names}\n")
-    return augmented_records
+        if not must_normalise_column_order:
+            row_projection = projection
+        elif mapped_projection is not None and len(record) == len(mappings):
+            row_projection = mapped_projection
+        else:
+            ## * the mapping doesn't fit: map_list() reports it & returns the row as is
+            record = map_list(record, mappings)
+            row_projection = projection
+        if row_is_clean:
+            yield ["" if source is None else record[source] for source in row_projection]
+        else:
+            yield [
+                "" if source is None else clean_cell_for_marc(record[source], record_num)
+                for source in row_projection
+            ]
 
 
-# def sanitize_string(text: str) -> tuple[str, int, list[str]]:
-def sanitize_string(text: str) -> tuple[str, str]:
-    # print("*** sanitizing string for export to Marc")
-    if not text:
-        # return ("", 0, [])
-        return ("","")
-    cleaned_parts = []
-    # removed_count = 0
-    # removed_chars = []
-    chars_removed = {"tabs":0, "newlines":0, "returns":0, "bom":0, "controls":0}
-    count = 0
-    details = ""
-    # Excel newline escape
-    # text = text.replace("_x000D_", "")
-    # text = text.replace("_x000A_", "")
-    for char in text:
-        if char == "\t":
-            cleaned_parts.append("    ")
-            # removed_count += 1
-            # removed_chars.append("tab")
-            chars_removed["tabs"] += 1
-            count += 1
-
-        # Normalize Windows and Unix line endings
-        elif char in ("\n", "\r"):
-            # removed_count += 1
-            # removed_chars.append("newline" if char == "\n" else "carriage return")
-            if char == "\n":
-                chars_removed["newlines"] += 1
-            else:
-                chars_removed["returns"] += 1
-            count += 1
-
-        # Remove BOM explicitly (Windows UTF‑8-with-BOM)
-        elif char == "\ufeff":
-            # removed_count += 1
-            # removed_chars.append("bom")
-            chars_removed["bom"] += 1
-            count += 1
-
-        # Remove ALL other control and format chars
-        elif unicodedata.category(char) in ("Cc", "Cf"):
-            # removed_count += 1
-            # removed_chars.append("control")
-            chars_removed["controls"] += 1
-            count += 1
-        else:
-            cleaned_parts.append(char)
-        if count:
-            details = ", ".join([f"{k}: {v}" for k, v in chars_removed.items() if v])
-            details = f"{count} invalid characters changed or removed: {details}"
+@cache
+def get_marc_column_projection(column_names: tuple[str, ...]) -> ColumnProjection:
+    """The pattern's columns are read in order into the Record fields they name"""
+    return project_marc_columns(column_names, range(len(column_names)))
 
-    # return "".join(cleaned_parts), removed_count, removed_chars
-    return "".join(cleaned_parts), details
+
+@cache
+def get_mapped_marc_column_projection(
+    column_names: tuple[str, ...], mappings: tuple[int, ...]
+) -> ColumnProjection | None:
+    """
+    Source column pos would have been moved to mappings[pos] first,
+    so the projection reads straight from where each value started.
+    Returns None if the mappings aren't a permutation (they can't be folded in).
+    """
+    if sorted(mappings) != list(range(len(mappings))):
+        return None
+    source_by_position = [0] * len(mappings)
+    for pos, new_pos in enumerate(mappings):
+        source_by_position[new_pos] = pos
+    return project_marc_columns(column_names, source_by_position)
+
+
+def project_marc_columns(
+    column_names: tuple[str, ...], source_by_position: Iterable[int]
+) -> ColumnProjection:
+    from . import marc_21
+
+    marc_column_names = [
+        f.name for f in fields(marc_21.Record) if f.name not in MARC_INTERNAL_FIELDS
+    ]
+    positions = iter(source_by_position)
+    return tuple(
+        next(positions) if marc_col_name in column_names else None
+        for marc_col_name in marc_column_names
+    )
+
+
+def clean_cell_for_marc(contents: str, record_num: int) -> str:
+    if isinstance(contents, str):
+        contents, _ = io.decode_excel_escapes(contents)
+        contents, details = io.sanitize_string(contents)
+        if details:
+            logging.warning(f"In record {record_num + 1}, {details}")
+    return contents
 
 
 # def sanitize_string(text: str) -> tuple[str, int, list[str]]:
@@ -518,66 +721,115 @@ def sanitize_string(text: str) -> tuple[str, str]:
 #     return contents
 
 
-def remove_dummy_rows(
-    records: list[list[str]], live_settings: Default_settings, COL
-) -> list:
+@dataclass
+class SkippedRows:
+    """
+    The rows left out of an export, by their index in the source rows;
+    filled in as the rows are read.
+    """
+
+    dummies: list[int] = field(default_factory=list)
+    empties: list[int] = field(default_factory=list)
+    exported: int = 0
+
+
+def filter_rows_for_export(
+    rows: Iterable[list[str]], live_settings: Default_settings, COL
+) -> tuple[Iterator[list[str]], SkippedRows]:
+    """
+    One pass: each row is classed as dummy, empty or exportable.
+    Returns the exportable rows (as they are read) & the report of those skipped
+    (complete once the rows are exhausted: see log_skipped_rows).
+    An empty row has no values, or values only in autofill columns.
+    """
+    report = SkippedRows()
+    return (iter_rows_for_export(rows, live_settings, COL, report), report)
+
+
+def count_rows_for_export(
+    rows: Iterable[list[str]], live_settings: Default_settings, COL
+) -> int:
+    """The number of records an export of rows will build (e.g. for its progress bar)"""
+    rows_to_export, _ = filter_rows_for_export(rows, live_settings, COL)
+    return sum(1 for _ in rows_to_export)
+
+
+def iter_rows_for_export(
+    rows: Iterable[list[str]], live_settings: Default_settings, COL, report: SkippedRows
+) -> Iterator[list[str]]:
     target_col_name = live_settings.validation.validation_skip_fieldname
-    if not target_col_name:
-        return records
-    # print(f">>>>>>>>>>>>>{target_col_name}")
-    target_col_index = COL[target_col_name].value
-    list_without_dummies = []
-    indices_of_dummies = []
-    for i, record in enumerate(records):
-        is_dummy = validation.is_dummy_content(
-            record[target_col_index], live_settings.validation.validation_skip_text
-        )
-        if is_dummy:
-            indices_of_dummies.append(i)
-            # continue
+    dummy_col_index = COL[target_col_name].value if target_col_name else None
+    autofill_indices = frozenset(
+        col_num
+        for col_num, col_name in enumerate(live_settings.column_names)
+        if col_name in live_settings.validation.fields_to_autofill
+    )
+    for row_num, row in enumerate(rows):
+        if dummy_col_index is not None and validation.is_dummy_content(
+            row[dummy_col_index], live_settings.validation.validation_skip_text
+        ):
+            report.dummies.append(row_num)
+        elif not any(
+            value and col_num not in autofill_indices
+            for col_num, value in enumerate(row)
+        ):
+            report.empties.append(row_num)
         else:
-            list_without_dummies.append(record)
-    number_of_rows_removed = len(indices_of_dummies)
+            report.exported += 1
+            yield row
+
+
+def log_skipped_rows(report: SkippedRows) -> None:
+    number_of_rows_removed = len(report.dummies)
     if number_of_rows_removed > 0:
-        # print(f"{indices_of_dummies=}")
         logging.warning(
-            f"The following {number_of_rows_removed} dummy record{singular_or_plural(number_of_rows_removed)} {singular_or_plural(number_of_rows_removed, "were", "was")} removed from the export to Marc 21 format: {", ".join((str(el + 1) for el in indices_of_dummies))}"
+            f"The following {number_of_rows_removed} dummy record{singular_or_plural(number_of_rows_removed)} {singular_or_plural(number_of_rows_removed, "were", "was")} removed from the export to Marc 21 format: {", ".join((str(el + 1) for el in report.dummies))}"
         )
-    return list_without_dummies
-
-
-def remove_empty_rows(
-    rows: list[list[str]], settings: Default_settings, COL
-) -> list[list[str]]:
+    if report.empties:
+        logger.info(f"{len(report.empties)} empty rows were removed.")
+
+
+def export_rows_as_marc(
+    rows: Iterable[list[str]],
+    file_name_with_path: Path,
+    live_settings: Default_settings,
+    COL,
+    on_progress: Callable[["marc_21.ExportProgress"], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> tuple[int, SkippedRows]:
     """
-    logic:
-    iterate each column in each row:
-    - if no value, then check the next col
-    - if the col is in an autofill column, ignore it and check next col
-    - if no values or only in autofill, skip this row
-    - as soon as a non-autofill value is found, save the whole row and go on to next row
+    Each row flows through filtering, formatting, parsing & building
+    and is written straight to the .mrk & .mrc files,
+    so memory use does not grow with the number of records.
+    Returns the number of records saved & the rows left out (see describe_skipped_rows).
+    (on_progress & is_cancelled: see marc_21.save_as_marc_files)
     """
-    full_rows = []
-    count_of_empty_rows = 0
-    for row_num, row in enumerate(rows):
-        this_row_is_empty = True
-        for col_num, value in enumerate(row):
-            # if row_num == 0:
-            # print(f"{col_num=} => {settings.column_names[col_num]} -> {settings.validation.fields_to_autofill}")
-            if not value:
-                continue
-            if settings.column_names[col_num] in settings.validation.fields_to_autofill:
-                continue
-            this_row_is_empty = False
-            break
-        if this_row_is_empty:
-            count_of_empty_rows += 1
-            continue
-        full_rows.append(row)
-    # full_rows = rows
-    if count_of_empty_rows:
-        logger.info(f"{count_of_empty_rows} empty rows were removed.")
-    return full_rows
+    from . import marc_21
+
+    rows_to_export, skipped = filter_rows_for_export(rows, live_settings, COL)
+    rows_in_marc_format = iter_rows_formatted_for_marc(rows_to_export, live_settings)
+    record_count = marc_21.save_as_marc_files(
+        rows_in_marc_format,
+        file_name_with_path,
+        live_settings,
+        on_progress,
+        is_cancelled,
+    )
+    log_skipped_rows(skipped)
+    return (record_count, skipped)
+
+
+def describe_skipped_rows(skipped: SkippedRows) -> str:
+    """For the export summary, e.g. '2 dummy records & 1 empty row were left out.' ("" if none)"""
+    parts = []
+    if skipped.dummies:
+        parts.append(f"{len(skipped.dummies)} dummy record{singular_or_plural(len(skipped.dummies))}")
+    if skipped.empties:
+        parts.append(f"{len(skipped.empties)} empty row{singular_or_plural(len(skipped.empties))}")
+    if not parts:
+        return ""
+    count = len(skipped.dummies) + len(skipped.empties)
+    return f"{" & ".join(parts)} {singular_or_plural(count, "were", "was")} left out."
 
 
 def singular_or_plural(count: int, plural="s", singular="") -> str:
@@ -585,11 +837,15 @@ def singular_or_plural(count: int, plural="s", singular="") -> str:
 
 
 # def get_existing_file(settings: Default_settings, COL:COL):
-def get_existing_file(settings: Default_settings):
+def get_existing_file(settings: Default_settings, stream_rows=False):
+    """
+    'stream_rows' returns the rows as an iterator that reads the file as it is consumed
+    """
     logging.info(f"processing file: {settings.files.in_file}")
-    headers, rows = io.parse_file_into_rows(
+    headers, row_stream = io.stream_file_into_rows(
         Path(settings.files.in_file), settings.first_row_is_header
     )
+    rows: Iterable[list[str]] = row_stream if stream_rows else list(row_stream)
     settings.files.out_file = f"{Path(settings.files.in_file).stem}.new"
     pattern_name = get_identity_of_file_pattern(settings, headers)
     # logger.info(f"{10*"*"}\nMatches: {pattern_name or "...nowt..."}\n{10*"*"}")
@@ -1059,6 +1315,8 @@ known_patterns = {
 
 
 def update_settings(settings, COL, pattern_name: str) -> None:
+    if marc_21 := sys.modules.get(f"{__package__}.marc_21"):  ## * no cache to clear until it's imported
+        marc_21.clear_boilerplate_cache()
     match pattern_name:
         case "art_cats":
             settings.title = pattern_name
@@ -14,13 +14,9 @@ from . import validation
 from . import io
 
 from string import punctuation
-from unittest import result
 
 # from openpyxl import load_workbook, Workbook  # type: ignore
 # from openpyxl.styles import Font, Alignment, PatternFill
-import openpyxl  # type: ignore
-import openpyxl.styles
-from openpyxl.worksheet.worksheet import Worksheet  # type: ignore
 from pymarc import (
     Record as PyRecord,
     Indicators,
@@ -35,12 +31,19 @@ from dataclasses import dataclass, fields, field
 
 # from abc import ABC, abstractmethod
 from typing import TypeAlias, Any
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Iterator
 
 # from pprint import pprint
 from datetime import date, datetime, timezone
 import re
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from functools import cache, lru_cache
+import heapq
+from collections import deque
+import os
+import threading
 
 
 logger = logging.getLogger(__name__)
@@ -48,13 +51,15 @@ logger = logging.getLogger(__name__)
 # worksheet_row: TypeAlias = list[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class Title:
     original: str
     transliteration: str
 
 
-@dataclass
+## * slots: no per-instance __dict__, so large batches of Records fit in far less memory
+## (dev/measure_record_memory.py compares this with the plain dataclass)
+@dataclass(slots=True)
 class Record:
     id: int
     sublib: str
@@ -98,7 +103,7 @@ class Record:
     item_policy: str
 
     internal_link_number: int
-    links: list[Field | None]
+    links: list[Field]
 
 
 ISBD = {
@@ -121,494 +126,65 @@ class Result:
     is_err: tuple[int, str] | None  ## [field number, error message]
 
 
+## * (tag, builder, is_mandatory, boilerplate) entries: see compile_field_plan() & bind_boilerplate()
+FieldPlan: TypeAlias = tuple[tuple[int, Callable[[Record], Result], bool, Result | None], ...]
+
+
 class MissingFieldError(Exception):
     pass
 
 split_marker = "*//*"
 
-code_by_state = {
-    "england": "enk",
-    "northernireland": "nik",
-    "ni": "nik",
-    "scotland": "stk",
-    "wales": "wlk",
-    "alberta": "abc",
-    "britishcolumbia": "bcc",
-    "manitoba": "mbc",
-    "newbrunswick": "nkc",
-    "newfoundland": "nfc",
-    "labrador": "nfc",
-    "newfoundlandlabrador": "nfc",
-    "northwestterritories": "ntc",
-    "novascotia": "nsc",
-    "nunavut": "nuc",
-    "ontario": "onc",
-    "princeedwardisland": "pic",
-    "québecprovince": "quc",
-    "québec": "quc",
-    "quebecprovince": "quc",
-    "quebec": "quc",
-    "saskatchewan": "snc",
-    "yukonterritory": "ykc",
-    "yukon": "ykc",
-    "alabama": "alu",
-    "alaska": "aku",
-    "arizona": "azu",
-    "arkansas": "aru",
-    "california": "cau",
-    "colorado": "cou",
-    "connecticut": "ctu",
-    "delaware": "deu",
-    "districtcolumbia": "dcu",
-    "columbia": "dcu",
-    "florida": "flu",
-    "georgia": "gau",
-    "hawaii": "hiu",
-    "idaho": "idu",
-    "illinois": "ilu",
-    "indiana": "inu",
-    "iowa": "iau",
-    "kansas": "ksu",
-    "kentucky": "kyu",
-    "louisiana": "lau",
-    "maine": "meu",
-    "maryland": "mdu",
-    "massachusetts": "mau",
-    "michigan": "miu",
-    "minnesota": "mnu",
-    "mississippi": "msu",
-    "missouri": "mou",
-    "montana": "mtu",
-    "nebraska": "nbu",
-    "nevada": "nvu",
-    "newhampshire": "nhu",
-    "newjersey": "nju",
-    "newmexico": "nmu",
-    "newyork": "nyu",
-    "newyorkstate": "nyu",
-    "northcarolina": "ncu",
-    "northdakota": "ndu",
-    "ohio": "ohu",
-    "oklahoma": "oku",
-    "oregon": "oru",
-    "pennsylvania": "pau",
-    "rhodeisland": "riu",
-    "southcarolina": "scu",
-    "southdakota": "sdu",
-    "tennessee": "tnu",
-    "texas": "txu",
-    "utah": "utu",
-    "vermont": "vtu",
-    "virginia": "vau",
-    "washington": "wau",
-    "washingtonstate": "wau",
-    "westvirginia": "wvu",
-    "wisconsin": "wiu",
-    "wyoming": "wyu",
-    "australiancapitalterritory": "aca",
-    "queensland": "qea",
-    "tasmania": "tma",
-    "victoria": "vra",
-    "westernaustralia": "wea",
-    "newsouthwales": "xna",
-    "northernterritory": "xoa",
-    "southaustralia": "xra",
-    "al": "alu",
-    "ak": "aku",
-    "az": "azu",
-    "ar": "aru",
-    "ca": "cau",
-    "co": "cou",
-    "ct": "ctu",
-    "de": "deu",
-    "dc": "dcu",
-    "fl": "flu",
-    "ga": "gau",
-    "hi": "hiu",
-    "id": "idu",
-    "il": "ilu",
-    "in": "inu",
-    "ia": "iau",
-    "ks": "ksu",
-    "ky": "kyu",
-    "la": "lau",
-    "me": "meu",
-    "md": "mdu",
-    "ma": "mau",
-    "mi": "miu",
-    "mn": "mnu",
-    "ms": "msu",
-    "mo": "mou",
-    "mt": "mtu",
-    "ne": "nbu",
-    "nv": "nvu",
-    "nh": "nhu",
-    "nj": "nju",
-    "nm": "nmu",
-    "ny": "nyu",
-    "nc": "ncu",
-    "nd": "ndu",
-    "oh": "ohu",
-    "ok": "oku",
-    "or": "oru",
-    "pa": "pau",
-    "ri": "riu",
-    "sc": "scu",
-    "sd": "sdu",
-    "tn": "tnu",
-    "tx": "txu",
-    "ut": "utu",
-    "vt": "vtu",
-    "va": "vau",
-    "wa": "wau",
-    "wv": "wvu",
-    "wi": "wiu",
-    "wy": "wyu",
-    "act": "aca",
-    "qld": "qea",
-    "tas": "tma",
-    "vic": "vra",
-    "wa": "wea",
-    "nsw": "xna",
-    "nt": "xoa",
-    "sa": "xra",
-    "alb": "abc",
-    "bc": "bcc",
-    "man": "mbc",
-    "nb": "nkc",
-    "nfd": "nfc",
-    "lab": "nfc",
-    "nwt": "ntc",
-    "ns": "nsc",
-    "nu": "nuc",
-    "ont": "onc",
-    "pei": "pic",
-    "que": "quc",
-    "sas": "snc",
-    "yt": "ykc",
-}
+## * the place codes live in data/marc_place_codes.yaml and are only loaded on first use (see get_place_codes())
+place_codes_file = Path(__file__).parent / "data" / "marc_place_codes.yaml"
+## * bump whenever what compile_place_codes() returns changes (see io.load_compiled_yaml)
+PLACE_CODES_VERSION = 2
 
-code_by_country = {
-    "usa": "xxu",
-    "us": "xxu",
-    "unitedstates": "xxu",
-    "unitedstatesamerica": "xxu",
-    "uk": "xxk",
-    "unitedkingdom": "xxk",
-    "england": "enk",
-    "scotland": "stk",
-    "wales": "wlk",
-    "northernireland": "nik",
-    "ni": "nik",
-    "canada": "xxc",
-    # "australia": "xxa",  # dummy 3-digit value to trigger detail; swap to "at" at output
-    "australia": "at",
-    "algeria": "ae",
-    "angola": "ao",
-    "benin": "dm",
-    "botswana": "bs",
-    "burkinafaso": "uv",
-    "burundi": "bd",
-    "cameroon": "cm",
-    "centralafricanrepublic": "cx",
-    "chad": "cd",
-    "congo": "cf",
-    "democraticrepubliccongo": "cg",
-    "côtedivoire": "iv",
-    "cotedivoire": "iv",
-    "djibouti": "ft",
-    "egypt": "ua",
-    "equatorialguinea": "eg",
-    "eritrea": "ea",
-    "ethiopia": "et",
-    "gabon": "go",
-    "gambia": "gm",
-    "ghana": "gh",
-    "guinea": "gv",
-    "guineabissau": "pg",
-    "kenya": "ke",
-    "lesotho": "lo",
-    "liberia": "lb",
-    "libya": "ly",
-    "madagascar": "mg",
-    "malawi": "mw",
-    "mali": "ml",
-    "mauritania": "mu",
-    "morocco": "mr",
-    "mozambique": "mz",
-    "namibia": "sx",
-    "niger": "ng",
-    "nigeria": "nr",
-    "rwanda": "rw",
-    "saotomeprincipe": "sf",
-    "senegal": "sg",
-    "sierraleone": "sl",
-    "somalia": "so",
-    "southafrica": "sa",
-    "southsudan": "sd",
-    "spanishnorthafrica": "sh",
-    "sudan": "sj",
-    "swaziland": "sq",
-    "tanzania": "tz",
-    "togo": "tg",
-    "tunisia": "ti",
-    "uganda": "ug",
-    "westernsahara": "ss",
-    "zambia": "za",
-    "zimbabwe": "rh",
-    "afghanistan": "af",
-    "armenia": "ai",
-    "republicarmenia": "ar",
-    "azerbaijan": "aj",
-    "bahrain": "ba",
-    "bangladesh": "bg",
-    "bhutan": "bt",
-    "brunei": "bx",
-    "burma": "br",
-    "cambodia": "cb",
-    "china": "cc",
-    "cyprus": "cy",
-    "easttimor": "em",
-    "gazastrip": "gz",
-    "georgia": "gs",
-    "georgianrepublic": "gs",
-    "republicgeorgia": "gs",
-    "india": "ii",
-    "indonesia": "io",
-    "iran": "ir",
-    "iraq": "iq",
-    "israel": "is",
-    "japan": "ja",
-    "jordan": "jo",
-    "kazakhstan": "kz",
-    "northkorea": "kn",
-    "korea": "ko",
-    "southkorea": "ko",
-    "kuwait": "ku",
-    "kyrgyzstan": "kg",
-    "laos": "ls",
-    "lebanon": "le",
-    "malaysia": "my",
-    "mongolia": "mp",
-    "nepal": "np",
-    "oman": "mk",
-    "pakistan": "pk",
-    "papuanewguinea": "pp",
-    "paracelislands": "pf",
-    "philippines": "ph",
-    "qatar": "qa",
-    "saudiarabia": "su",
-    "singapore": "si",
-    "spratlyisland": "xp",
-    "srilanka": "ce",
-    "syria": "sy",
-    "tajikistan": "ta",
-    "thailand": "th",
-    "turkey": "tu",
-    "turkmenistan": "tk",
-    "unitedarabemirates": "ts",
-    "uae": "ts",
-    "uzbekistan": "uz",
-    "vietnam": "vm",
-    "westbankjordanriver": "wj",
-    "westbank": "wj",
-    "yemen": "ye",
-    "bermudaislands": "bm",
-    "bermuda": "bm",
-    "bouvetisland": "bv",
-    "caboverde": "cv",
-    "faroeislands": "fa",
-    "faroes": "fa",
-    "falklandislands": "fk",
-    "falklands": "fk",
-    "sainthelena": "xj",
-    "southgeorgiasouthsandwichislands": "xs",
-    "southgeorgia": "xs",
-    "southsandwichislands": "xs",
-    "belize": "bh",
-    "costarica": "cr",
-    "elsalvador": "es",
-    "guatemala": "gt",
-    "honduras": "ho",
-    "nicaragua": "nq",
-    "panama": "pn",
-    "albania": "aa",
-    "andorra": "an",
-    "austria": "au",
-    "belarus": "bw",
-    "belgium": "be",
-    "bosniaherzegovina": "bn",
-    "bosnia": "bn",
-    "bosniaherzegovina": "bn",
-    "herzegovina": "bn",
-    "bulgaria": "bu",
-    "croatia": "ci",
-    "czechrepublic": "xr",
-    "czechia": "xr",
-    "denmark": "dk",
-    "estonia": "er",
-    "finland": "fi",
-    "france": "fr",
-    "germany": "gw",
-    "gibraltar": "gi",
-    "greece": "gr",
-    "guernsey": "gg",
-    "hungary": "hu",
-    "iceland": "ic",
-    "ireland": "ie",
-    "eire": "ie",
-    "isleman": "im",
-    "italy": "it",
-    "jersey": "je",
-    "kosovo": "kv",
-    "latvia": "lv",
-    "liechtenstein": "lh",
-    "lithuania": "li",
-    "luxembourg": "lu",
-    "macedonia": "xn",
-    "malta": "mm",
-    "montenegro": "mo",
-    "moldova": "mv",
-    "monaco": "mc",
-    "netherlands": "ne",
-    "norway": "no",
-    "poland": "pl",
-    "portugal": "po",
-    "serbia": "rb",
-    "romania": "rm",
-    "russia": "ru",
-    "russianfederation": "ru",
-    "sanmarino": "sm",
-    "slovakia": "xo",
-    "slovenia": "xv",
-    "spain": "sp",
-    "sweden": "sw",
-    "switzerland": "sz",
-    "ukraine": "un",
-    "vaticancity": "vc",
-    "serbiamontenegro": "yu",
-    "britishindianoceanterritory": "bi",
-    "christmasisland": "xa",
-    "cocosislands": "xb",
-    "keelingislands": "xb",
-    "comoros": "cq",
-    "heardmcdonaldislands": "hm",
-    "maldives": "xc",
-    "mauritius": "mf",
-    "mayotte": "ot",
-    "réunion": "re",
-    "reunion": "re",
-    "seychelles": "se",
-    "americansamoa": "as",
-    "cookislands": "cw",
-    "fiji": "fj",
-    "frenchpolynesia": "fp",
-    "guam": "gu",
-    "johnstonatoll": "ji",
-    "kiribati": "gb",
-    "marshallislands": "xe",
-    "micronesia": "fm",
-    "federatedstatesmicronesia": "fm",
-    "midwayislands": "xf",
-    "nauru": "nu",
-    "newcaledonia": "nl",
-    "niue": "xh",
-    "northernmarianaislands": "nw",
-    "palau": "pw",
-    "pitcairnisland": "pc",
-    "samoa": "ws",
-    "solomonislands": "bp",
-    "tokelau": "tl",
-    "tonga": "to",
-    "tuvalu": "tv",
-    "vanuatu": "nn",
-    "wakeisland": "wk",
-    "wallisfutuna": "wf",
-    "wallis": "wf",
-    "futuna": "wf",
-    "argentina": "ag",
-    "bolivia": "bo",
-    "brazil": "bl",
-    "chile": "cl",
-    "colombia": "ck",
-    "ecuador": "ec",
-    "frenchguiana": "fg",
-    "guyana": "gy",
-    "paraguay": "py",
-    "peru": "pe",
-    "surinam": "sr",
-    "uruguay": "uy",
-    "venezuela": "ve",
-    "anguilla": "am",
-    "antiguabarbuda": "aq",
-    "antigua": "aq",
-    "barbuda": "aq",
-    "aruba": "aw",
-    "bahamas": "bf",
-    "barbados": "bb",
-    "britishvirginislands": "vb",
-    "caribbeannetherlands": "ca",
-    "caymanislands": "cj",
-    "cuba": "cu",
-    "curaçao": "co",
-    "curacao": "co",
-    "dominica": "dq",
-    "dominicanrepublic": "dr",
-    "grenada": "gd",
-    "guadeloupe": "gp",
-    "haiti": "ht",
-    "jamaica": "jm",
-    "martinique": "mq",
-    "montserrat": "mj",
-    "puertorico": "pr",
-    "saintbarthélemy": "sc",
-    "saintbarthelemy": "sc",
-    "saintkittsnevis": "xd",
-    "saintkitts": "xd",
-    "nevis": "xd",
-    "saintlucia": "xk",
-    "saintmartin": "st",
-    "saintvincentgrenadines": "xm",
-    "saintvincent": "xm",
-    "grenadines": "xm",
-    "sintmaarten": "sn",
-    "trinidadtobago": "tr",
-    "trinidad": "tr",
-    "tobago": "tr",
-    "turkscaicosislands": "tc",
-    "virginislandsunitedstates": "vi",
-    "antarctica": "ay",
-    "noplace": "xx",
-    "unknown": "xx",
-    "undetermined": "xx",
-    "variousplaces": "vp",
-    "various": "vp",
-}
 
-all_country_codes = set(code_by_state.values())
-all_country_codes.update(code_by_country.values())
-
-code_by_city = {
-    "newyork": "nyu",
-    "london":"enk",
-    "edinburgh":"stk",
-    "glasgow":"stk",
-    "belfast": "nik",
-    "cardiff": "wlk",
-    "toronto": "onc",
-    "montreal": "quc",
-    "montréal": "quc",
-    "vancouver": "bcc",
-    "calgary": "abc",
-    "ottawa": "onc",
-    "edmonton": "abc",
-    "winnipeg": "mbc",
-    "Sydney": "xna",
-    "Melbourne": "vra",
-    "Brisbane": "qea",
-    "Perth": "wea",
-    "Adelaide": "xra",
-}
+@dataclass
+class PlaceCodes:
+    code_by_country: dict[str, str]
+    code_by_state: dict[str, str]
+    code_by_city: dict[str, str]
+    all_country_codes: set[str]
+    name_by_key: dict[str, str]  ## normalised name -> the name as written in the data file
+
+
+@cache
+def get_place_codes() -> PlaceCodes:
+    tables = io.load_compiled_yaml(place_codes_file, compile_place_codes, PLACE_CODES_VERSION)
+    all_country_codes = set(tables["state"].values())
+    all_country_codes.update(tables["country"].values())
+    return PlaceCodes(
+        tables["country"], tables["state"], tables["city"], all_country_codes, tables["name"]
+    )
+
+
+def compile_place_codes(raw_tables: dict) -> dict[str, dict[str, str]]:
+    """
+    Keys are stored already normalised, so each lookup is a single dict access;
+    the "name" table keeps the name each key was written as (the first, if several), to show the user
+    """
+    tables = {}
+    name_by_key: dict[str, str] = {}
+    for table_name in ("country", "state", "city"):
+        table = {}
+        for name, code in raw_tables[table_name].items():
+            key = norm_location(str(name))
+            if key:  ## e.g. 'in' (Indiana) would otherwise match a blank place
+                table[key] = str(code)
+                name_by_key.setdefault(key, str(name))
+        tables[table_name] = table
+    tables["name"] = name_by_key
+    return tables
+
+
+def __getattr__(name: str):
+    ## * the tables used to be module-level dicts: keep them importable (PEP 562)
+    if name in ("code_by_country", "code_by_state", "code_by_city", "all_country_codes"):
+        return getattr(get_place_codes(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 code_can_be_expanded = {"xxu", "xxk", "xxc", "at"}
 
@@ -681,16 +257,16 @@ def norm_langs(raw: str) -> list[str]:
     return list_of_languages
 
 
+location_stopwords = re.compile(r"\b(?:the|of|in|and)\b")
+location_separators = re.compile(r"[\s\-\.'&]")
+
+
 def norm_location(name: str) -> str:
     name = name.strip()
     if not name:
         return ""
-    wip = name.lower()
-    for word in ["the", "of", "in", "and"]:
-        regex = re.compile(r"\b%s\b" % re.escape(word))
-        wip = re.sub(regex, "", wip)
-    wip = re.sub(r"[\s\-\.'&]", "", wip)
-    return wip
+    wip = location_stopwords.sub("", name.lower())
+    return location_separators.sub("", wip)
 
 
 def norm_place(raw_places: str) -> list[str]:
@@ -711,17 +287,100 @@ def norm_place(raw_places: str) -> list[str]:
 def check_country(country:str) -> str:
     normed = norm_location(country)
     # print(f"normed country: {normed}")
-    return code_by_country.get(normed, "")
+    return get_place_codes().code_by_country.get(normed, "")
 
 def check_state(state:str) -> str:
     normed = norm_location(state)
     # print(f"normed state: {normed}")
-    return code_by_state.get(normed, "")
+    return get_place_codes().code_by_state.get(normed, "")
 
 def check_city(place:str) -> str:
     normed = norm_location(place)
     # print(f"normed place: {normed}")
-    return code_by_city.get(normed, "")
+    return get_place_codes().code_by_city.get(normed, "")
+
+
+def is_recognised_country(country: str) -> bool:
+    return is_possibly_marc_country_code(country) or bool(check_country(country))
+
+
+def describe_unrecognised_country(country: str) -> str:
+    msg = f"country of publication ({country}) is not recognized."
+    suggestions = suggest_place_codes(country)
+    if suggestions:
+        msg += f" Did you mean: {", ".join(f"{name} ({code})" for name, code in suggestions)}?"
+    return msg
+
+
+@cache
+def get_place_suggestion_index() -> tuple[list[tuple[str, str, str]], dict[str, list[int]]]:
+    """
+    (normalised name, name as written, code) entries of the country & state tables
+    + an inverted index of the trigrams in each normalised name
+    """
+    place_codes = get_place_codes()
+    entries = [
+        (name, place_codes.name_by_key[name], code)
+        for name, code in dict.fromkeys(
+            [*place_codes.code_by_country.items(), *place_codes.code_by_state.items()]
+        )
+    ]
+    index: dict[str, list[int]] = {}
+    for entry_num, (name, _, _) in enumerate(entries):
+        for trigram in get_trigrams(name):
+            index.setdefault(trigram, []).append(entry_num)
+    return entries, index
+
+
+def get_trigrams(normed_name: str) -> set[str]:
+    padded = f"  {normed_name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@lru_cache(maxsize=1024)
+def suggest_place_codes(name: str, k=3) -> list[tuple[str, str]]:
+    """
+    The k nearest (name, code) pairs to a place that isn't recognised, best first,
+    named as in the data file (e.g. United Kingdom rather than its lookup key, unitedkingdom).
+    Only names sharing trigrams with it are compared (by edit distance),
+    so there's no scan of every name in the tables.
+    """
+    normed = norm_location(name)
+    if not normed:
+        return []
+    entries, index = get_place_suggestion_index()
+    shared_trigrams: dict[int, int] = {}
+    for trigram in get_trigrams(normed):
+        for entry_num in index.get(trigram, ()):
+            shared_trigrams[entry_num] = shared_trigrams.get(entry_num, 0) + 1
+    candidates = heapq.nlargest(10, shared_trigrams, key=shared_trigrams.__getitem__)
+    max_distance = max(1, len(normed) // 3)
+    scored = []
+    for entry_num in candidates:
+        candidate, display_name, code = entries[entry_num]
+        if abs(len(candidate) - len(normed)) > max_distance:
+            continue
+        distance = edit_distance(normed, candidate)
+        if distance <= max_distance:
+            scored.append((distance, -shared_trigrams[entry_num], candidate, display_name, code))
+    scored.sort()
+    return [(display_name, code) for _, _, _, display_name, code in scored[:k]]
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance, counting the transposition of neighbouring letters ('Itlay') as one edit"""
+    previous_previous: list[int] = []
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            cost = 0 if char_a == char_b else 1
+            distance = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                distance = min(distance, previous_previous[j - 2] + 1)
+            current.append(distance)
+        previous_previous, previous = previous, current
+    return previous[-1]
 
 
 def get_city_and_state(place:str) -> tuple[str, str, str]:
@@ -755,10 +414,23 @@ def get_city_and_state(place:str) -> tuple[str, str, str]:
 
 
 def get_country_code(country:str, place:str, row_num:int) -> tuple[str, str, str]:
+    if is_possibly_marc_country_code(country):
+        print(f"Record: {row_num}: the country '{country}' may already have been converted to a Marc code. Please check.")
+    return resolve_place(country, place)
+
+
+def is_possibly_marc_country_code(country: str) -> bool:
+    return len(country) < 4 and country.lower() not in ("us", "usa", "uk")
+
+
+## * batches reuse a handful of places, so nearly every lookup is a hit once warmed up
+## (call resolve_place.cache_clear() if data/marc_place_codes.yaml changes while running)
+@lru_cache(maxsize=4096)
+def resolve_place(country: str, place: str) -> tuple[str, str, str]:
+    """returns: [city, state, country_code]"""
     city, state, tmp_country_code = get_city_and_state(place)
-    if len(country) < 4 and country.lower() not in ("us", "usa", "uk"):
+    if is_possibly_marc_country_code(country):
         country_code = country.lower()
-        print(f"Record: {row_num}: the country '{country}' may already have been converted to a Marc code. Please check.")
     else:
         country_code = check_country(country)
     if country_code and country_code in code_can_be_expanded:
@@ -910,13 +582,87 @@ def create_date_list(dates_raw: str) -> list[str]:
     return dates
 
 
+PARSE_MEMO_LIMIT = 10_000
+
+
+class ParseMemo:
+    """
+    Runs each normaliser once per distinct value in its column (most columns repeat across a file).
+    The warnings a normaliser logged are kept with its result and re-logged on every later hit,
+    so the log is the same as when each row is parsed from scratch.
+    """
+
+    def __init__(self, limit: int = PARSE_MEMO_LIMIT) -> None:
+        self.limit = limit
+        self.results: dict[tuple[Callable, Any], tuple[Any, list[logging.LogRecord]]] = {}
+
+    def __call__(self, normaliser: Callable, raw: Any) -> Any:
+        key = (normaliser, raw)
+        try:
+            hit = self.results.get(key)
+        except TypeError:
+            ## * unhashable cell: nothing to share
+            return normaliser(raw)
+        if hit is not None:
+            result, log_records = hit
+            for log_record in log_records:
+                replay_log_record(log_record)
+            return result
+        if len(self.results) >= self.limit:
+            return normaliser(raw)
+        ## * the export may run on a worker thread: leave the other threads' records alone
+        collector = LogCollector(threading.get_ident())
+        root_logger = logging.getLogger()
+        root_logger.addHandler(collector)
+        try:
+            result = normaliser(raw)
+        finally:
+            root_logger.removeHandler(collector)
+        self.results[key] = (result, collector.log_records)
+        return result
+
+
+def run_normaliser(normaliser: Callable, raw: Any) -> Any:
+    return normaliser(raw)
+
+
+def replay_log_record(log_record: logging.LogRecord) -> None:
+    ## * a fresh copy, so the replayed message gets its own timestamp
+    attributes = {
+        key: value
+        for key, value in log_record.__dict__.items()
+        if key not in ("created", "msecs", "relativeCreated")
+    }
+    logging.getLogger(log_record.name).handle(logging.makeLogRecord(attributes))
+
+
+def norm_pub_year(year_raw: str) -> tuple[str, bool]:
+    return check_for_approx(norm_year(year_raw))
+
+
+def norm_and_process_authors(authors: tuple[str, ...]) -> list[tuple[str, str]]:
+    return process_authors(list(authors))
+
+
 def parse_rows_into_records(
         # sheet: list[worksheet_row],
         sheet: list[list[str]],
         live_settings:Default_settings
         ) -> list[Record]:
+    return list(iter_records_from_rows(sheet, live_settings))
+
+
+def iter_records_from_rows(
+        sheet: Iterable[list[str]],
+        live_settings:Default_settings,
+        memoize: bool = True,
+        ) -> Iterator[Record]:
+    """
+    memoize: normalise each distinct cell value once per column (see ParseMemo);
+    the Records and warnings are the same either way
+    """
     current_time = datetime.now()
-    records = []
+    memo = ParseMemo() if memoize else None
     logger.info("\n\n++++ Validating records")
     # print(f"Marc21 parse rows: {live_settings.column_names=}")
     for row_num, row in enumerate(sheet):
@@ -931,11 +677,11 @@ def parse_rows_into_records(
             row_num,
             current_time,
             live_settings,
+            memo,
             )
         # validate_record(record, row_num + 1, live_settings)
         ## ** first-pass validation already applied, further validation performed when records are built
-        records.append(record)
-    return records
+        yield record
 
 
 def parse_row(
@@ -943,17 +689,20 @@ def parse_row(
         row_num: int,
         current_time: datetime,
         live_settings: Default_settings,
+        memo: ParseMemo | None = None,
         ) -> Record:
     """
     coerces data into expected types
     performs first-pass validation
+    normalisers that don't depend on the row number go through the memo, if given
     """
     # print(f"Marc21.py: parsing row {row_num} (={len(row)} cols)")
     _col = iter(row)
+    normalise = memo or run_normaliser
 
     id = row_num
     sublibrary = next(_col)
-    langs = norm_langs(next(_col))
+    langs = normalise(norm_langs, next(_col))
     isbn = norm_isbn(next(_col), row_num)
     title_orig = next(_col)
     title_tr = next(_col)
@@ -966,18 +715,18 @@ def parse_row(
     country_name = next(_col)
     place = next(_col)
     publisher = next(_col)
-    pub_date, pub_date_is_approx = check_for_approx(norm_year(next(_col)))
-    copyright_ = norm_copyright(next(_col))
-    pagination, pagination_is_approx = norm_pages(next(_col))
-    size = norm_size(next(_col))
-    illustrations = norm_illustrations(next(_col))
+    pub_date, pub_date_is_approx = normalise(norm_pub_year, next(_col))
+    copyright_ = normalise(norm_copyright, next(_col))
+    pagination, pagination_is_approx = normalise(norm_pages, next(_col))
+    size = normalise(norm_size, next(_col))
+    illustrations = normalise(norm_illustrations, next(_col))
     series_title = next(_col)
     series_enum = next(_col)
     volume = next(_col)
     notes = next(_col)
     sales_code = next(_col)
-    sale_dates = create_date_list(next(_col))
-    hol_notes, item_policy = get_item_policy_from_hol_notes(next(_col))
+    sale_dates = normalise(create_date_list, next(_col))
+    hol_notes, item_policy = normalise(get_item_policy_from_hol_notes, next(_col))
     donation = next(_col)
     barcode = norm_barcode(next(_col), row_num)
 
@@ -986,8 +735,10 @@ def parse_row(
     parallel_title = Title(parallel_title_orig, parallel_title_tr)
     parallel_subtitle = Title(parallel_subtitle_orig, parallel_subtitle_tr)
     place, state, country_code = get_country_code(country_name, place, row_num)
+    if country_name and not is_recognised_country(country_name):
+        logger.warning(f"Record {row_num + 1}: {describe_unrecognised_country(country_name)}")
 
-    authors = norm_authors(next(_col))
+    authors = normalise(norm_authors, next(_col))
     artist = next(_col)
     call_number = next(_col)
 
@@ -1003,7 +754,7 @@ def parse_row(
         else:
             authors = [artist]
         artist = ""
-    authors = process_authors(authors)
+    authors = normalise(norm_and_process_authors, tuple(authors))
 
     record = Record(
         id,
@@ -1099,8 +850,11 @@ def build_005(record: Record) -> Result:
     """date & time of transaction
     "The date requires 8 numeric characters in the pattern yyyymmdd. The time requires 8 numeric characters in the pattern hhmmss.f, expressed in terms of the 24-hour (00-23) clock."
     """
+    return build_005_from_time(record.timestamp.now(timezone.utc))
+
+
+def build_005_from_time(standard_time: datetime) -> Result:
     tag = 5
-    standard_time = record.timestamp.now(timezone.utc)
     ## NB: python produces this format: YYYY-MM-DD HH:MM:SS.ffffff, e.g. 2020-09-30 12:37:55.713351
     timestamp = str(standard_time).translate(str.maketrans("", "", " -:"))[:16]
     result = Result(Field(tag=link_num(tag), data=timestamp), None)
@@ -1349,6 +1103,13 @@ def build_300(record: Record) -> Result:
 
 def build_336(record: Record) -> Result:
     """content type (boilerplate)"""
+    is_illustrated = record.illustrations.lower() == "full"
+    if cached_result := content_type_results.get(is_illustrated):
+        return cached_result
+    return build_content_type(is_illustrated)
+
+
+def build_content_type(is_illustrated: bool) -> Result:
     tag = 336
     i1, i2 = ISBD["BLANK"], ISBD["BLANK"]
     text_content = [
@@ -1358,7 +1119,7 @@ def build_336(record: Record) -> Result:
     text_field = Field(
         tag=link_num(tag), indicators=Indicators(i1, i2), subfields=text_content
     )
-    if record.illustrations.lower() == "full":
+    if is_illustrated:
         illus_content = [
             Subfield(value="still image", code="a"),
             Subfield(value="rdacontent", code="2"),
@@ -1924,85 +1685,344 @@ def check_for_nonfiling(title: str, lang: str = "eng") -> tuple[str, str]:
     return result
 
 
-def build_marc_records(records: list[Record], mandatory_marc_fields:dict) -> list[PyRecord]:
+## * below this many records, starting a process pool costs more than it saves
+PARALLEL_BUILD_THRESHOLD = 1000
+PARALLEL_CHUNK_SIZE = 250
+
+
+def build_marc_records(
+    records: list[Record],
+    mandatory_marc_fields: dict,
+    workers: int | None = 1,
+    column_names: Iterable[str] | None = None,
+) -> list[PyRecord]:
+    return list(
+        iter_marc_records(records, mandatory_marc_fields, workers, column_names)
+    )
+
+
+def iter_marc_records(
+    records: Iterable[Record],
+    mandatory_marc_fields: dict,
+    workers: int | None = 1,
+    column_names: Iterable[str] | None = None,
+) -> Iterator[PyRecord]:
+    """
+    column_names (the pattern's) let the field plan skip builders with no data to draw on.
+    workers > 1 (or None: one per cpu) builds the records in chunks on a process pool,
+    with only a few chunks in flight at a time.
+    Each record's 880 linkage is numbered from the record itself,
+    so the output (& the log) is identical to the serial build.
+    The batch's boilerplate is cleared once the records are built (or the build stops),
+    so a record built later (e.g. by apply_marc_logic) doesn't get this batch's 005 timestamp.
+    """
     ## NB. This differs from the non-pymarc version
+    if workers is None:
+        workers = os.cpu_count() or 1
+    timestamp = start_export_batch()
+    plan = bind_boilerplate(get_field_plan(mandatory_marc_fields, column_names))
+    try:
+        yield from iter_batch_of_marc_records(records, plan, workers, timestamp)
+    finally:
+        clear_boilerplate_cache()
+
+
+def iter_batch_of_marc_records(
+    records: Iterable[Record], plan: FieldPlan, workers: int, timestamp: datetime
+) -> Iterator[PyRecord]:
+    _records = iter(records)
+    ## * only look ahead when a parallel build is possible: the serial build streams from the first record
+    first_records = list(islice(_records, PARALLEL_BUILD_THRESHOLD)) if workers > 1 else []
+    if workers <= 1 or len(first_records) < PARALLEL_BUILD_THRESHOLD:
+        for i, record in enumerate(chain(first_records, _records)):
+            logger.info(f"Building marc record no.{i+1}")
+            yield apply_field_plan(record, plan)
+        return
+    chunks = iter_chunks(chain(first_records, _records), PARALLEL_CHUNK_SIZE)
+    del first_records
+    log_level = logging.getLogger().level
+    in_flight: deque = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        start = 0
+        for chunk in chunks:
+            in_flight.append(
+                executor.submit(
+                    build_chunk_in_worker,
+                    chunk,
+                    plan,
+                    start,
+                    log_level,
+                    timestamp,
+                )
+            )
+            start += len(chunk)
+            if len(in_flight) >= workers * 2:
+                yield from collect_chunk(in_flight.popleft().result())
+        while in_flight:
+            yield from collect_chunk(in_flight.popleft().result())
+
+
+def iter_chunks(items: Iterable, size: int) -> Iterator[list]:
+    _items = iter(items)
+    while chunk := list(islice(_items, size)):
+        yield chunk
+
+
+def collect_chunk(
+    result: tuple[list[PyRecord], list[logging.LogRecord]],
+) -> list[PyRecord]:
+    marc_records, log_records = result
+    for log_record in log_records:
+        logging.getLogger(log_record.name).handle(log_record)
+    return marc_records
+
+
+def build_chunk_of_marc_records(
+    records: list[Record], plan: FieldPlan, start=0
+) -> list[PyRecord]:
     marc_records: list[PyRecord] = []
-    for i, record in enumerate(records):
+    for i, record in enumerate(records, start):
         logger.info(f"Building marc record no.{i+1}")
-        marc = apply_marc_logic(record, mandatory_marc_fields)
+        marc = apply_field_plan(record, plan)
         marc_records.append(marc)
     return marc_records
 
 
-def apply_marc_logic(record: Record, mandatory_marc_fields:dict) -> PyRecord:
-    fields_to_deploy: tuple[Callable, ...] = (
-        build_000,
-        build_040,  # cataloguing source: Oxford (boilerplate)
-        build_336,  # content type (boilerplate)
-        build_337,  # media type (boilerplate)
-        build_338,  # carrier type (boilerplate)
-        build_904,  # authority Ox Local Record (boilerplate)
-        build_005,  # timestamp (boilerplate)
-        build_008,  # pub details
-        build_033,  # sale date
-        build_245,  # title
-        build_264,  # publisher & copyright
-        build_300,  # physical description
-        build_490,  # series statement
-        build_876,  # notes / barcode
-        build_020,  # isbn
-        build_024,  # sales code
-        build_041,  # language if not monolingual
-        build_246,  # parallel title
-        build_500,  # general notes
-        build_100,  # artist
-        build_700,  # author(s)
-        build_852,  # call number
+class LogCollector(logging.Handler):
+    def __init__(self, thread_id: int | None = None) -> None:
+        """With thread_id, only the records logged by that thread are collected"""
+        super().__init__()
+        self.log_records: list[logging.LogRecord] = []
+        if thread_id is not None:
+            self.addFilter(lambda record: record.thread == thread_id)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        ## * format now: the args may not survive the trip back to the main process
+        record.msg, record.args = record.getMessage(), None
+        record.exc_info = None
+        self.log_records.append(record)
+
+
+def build_chunk_in_worker(
+    records: list[Record],
+    plan: FieldPlan,
+    start: int,
+    log_level: int,
+    timestamp: datetime,
+) -> tuple[list[PyRecord], list[logging.LogRecord]]:
+    """
+    Runs in a pool process: its log messages are returned
+    so the main process can log them in record order
+    """
+    if batch_timestamp != timestamp:
+        start_export_batch(timestamp)
+    root_logger = logging.getLogger()
+    collector = LogCollector()
+    root_logger.handlers = [collector]
+    root_logger.setLevel(log_level)
+    marc_records = build_chunk_of_marc_records(records, plan, start)
+    return marc_records, collector.log_records
+
+
+## * fields that are identical for every record in an export: built once per batch by start_export_batch()
+boilerplate_results: dict[Callable, Result] = {}
+content_type_results: dict[bool, Result] = {}
+batch_timestamp: datetime | None = None
+
+
+def start_export_batch(timestamp: datetime | None = None) -> datetime:
+    """
+    (Re)builds the boilerplate fields, incl. a single 005 timestamp for the whole batch.
+    Returns the timestamp so that pool workers can share it.
+    """
+    global batch_timestamp
+    clear_boilerplate_cache()
+    batch_timestamp = timestamp or datetime.now(timezone.utc)
+    for builder in (build_000, build_040, build_337, build_338, build_904):
+        boilerplate_results[builder] = builder(None)  # type: ignore  ## they don't read the record
+    boilerplate_results[build_005] = build_005_from_time(batch_timestamp)
+    for is_illustrated in (True, False):
+        content_type_results[is_illustrated] = build_content_type(is_illustrated)
+    return batch_timestamp
+
+
+def clear_boilerplate_cache() -> None:
+    """Call whenever settings change; records are then built field by field until the next batch starts"""
+    global batch_timestamp
+    boilerplate_results.clear()
+    content_type_results.clear()
+    batch_timestamp = None
+
+
+## * every field builder, in build order, with the columns it draws on
+## (none = always built; otherwise skipped, if optional, when the pattern has none of them)
+FIELD_BUILDERS: tuple[tuple[int, Callable[[Record], Result], tuple[str, ...]], ...] = (
+    (0, build_000, ()),
+    (40, build_040, ()),  # cataloguing source: Oxford (boilerplate)
+    (336, build_336, ()),  # content type (boilerplate)
+    (337, build_337, ()),  # media type (boilerplate)
+    (338, build_338, ()),  # carrier type (boilerplate)
+    (904, build_904, ()),  # authority Ox Local Record (boilerplate)
+    (5, build_005, ()),  # timestamp (boilerplate)
+    (8, build_008, ()),  # pub details
+    (33, build_033, ("sale_dates",)),  # sale date
+    (245, build_245, ()),  # title
+    (264, build_264, ()),  # publisher & copyright
+    (300, build_300, ()),  # physical description
+    (490, build_490, ("series_title", "series_enum")),  # series statement
+    (876, build_876, ()),  # notes / barcode
+    (20, build_020, ("isbn",)),  # isbn
+    (24, build_024, ("sales_code",)),  # sales code
+    (41, build_041, ("langs",)),  # language if not monolingual
+    (246, build_246, ("parallel_title", "tr_parallel_title")),  # parallel title
+    (500, build_500, ("notes",)),  # general notes
+    (100, build_100, ("authors", "artist")),  # artist
+    (700, build_700, ("authors", "artist")),  # author(s)
+    (852, build_852, ("call_number",)),  # call number
+)
+
+def get_field_plan(
+    mandatory_marc_fields: dict, column_names: Iterable[str] | None = None
+) -> FieldPlan:
+    return compile_field_plan(
+        tuple(mandatory_marc_fields.items()),
+        tuple(column_names) if column_names is not None else None,
+    )
+
+
+@cache
+def compile_field_plan(
+    mandatory_marc_fields: tuple[tuple[int, bool], ...],
+    column_names: tuple[str, ...] | None,
+) -> FieldPlan:
+    """
+    Compiled once per pattern into (tag, builder, is_mandatory, None) entries;
+    tags missing from mandatory_marc_fields are optional.
+    Without column_names every builder is kept.
+    """
+    is_mandatory_by_tag = dict(mandatory_marc_fields)
+    plan = []
+    for tag, builder, source_columns in FIELD_BUILDERS:
+        is_mandatory = is_mandatory_by_tag.get(tag, False)
+        if (
+            column_names is not None
+            and source_columns
+            and not is_mandatory
+            and not any(column in column_names for column in source_columns)
+        ):
+            continue
+        plan.append((tag, builder, is_mandatory, None))
+    return tuple(plan)
+
+
+def bind_boilerplate(plan: FieldPlan) -> FieldPlan:
+    """
+    The plan with the current batch's boilerplate results (see start_export_batch) folded in,
+    so building a record needn't look them up; outside a batch, every field is built.
+    """
+    return tuple(
+        (tag, builder, is_mandatory, boilerplate_results.get(builder))
+        for tag, builder, is_mandatory, _ in plan
     )
+
+
+def apply_marc_logic(record: Record, mandatory_marc_fields:dict) -> PyRecord:
+    return apply_field_plan(record, bind_boilerplate(get_field_plan(mandatory_marc_fields)))
+
+
+def apply_field_plan(record: Record, plan: FieldPlan) -> PyRecord:
     pymarc_record = PyRecord()
-    # for builder, is_mandatory in fields_to_deploy:
-    for builder in fields_to_deploy:
-        field_num = int(builder.__name__[6:])
-        is_mandatory = mandatory_marc_fields[field_num]
-        # print(f"DEBUG: {builder.__name__}, {field_num=}, {mandatory_marc_fields[field_num]}")
-        build_output: Result = builder(record)
+    marc_fields: list[Field] = []
+    for tag, builder, is_mandatory, boilerplate in plan:
+        build_output = boilerplate or builder(record)
         returned_fields = check_if_mandatory(build_output, is_mandatory)
         if returned_fields:
-            if builder.__name__ == "build_000":
+            if tag == 0:
                 pymarc_record.leader = returned_fields[0].value()
             else:
-                for pyfield in returned_fields:
-                    pymarc_record.add_ordered_field(pyfield)
-    for link in record.links:
-        pymarc_record.add_ordered_field(link)
+                marc_fields.extend(returned_fields)
+    marc_fields.extend(record.links)
+    attach_fields_in_order(pymarc_record, marc_fields)
     return pymarc_record
 
 
+def attach_fields_in_order(pymarc_record: PyRecord, marc_fields: list[Field]) -> None:
+    """
+    One stable sort by tag gives the same order as adding the fields one by one
+    with add_ordered_field() (which rescans the record for every field)
+    """
+    if all(field.tag.isdigit() for field in marc_fields):
+        pymarc_record.fields = sorted(marc_fields, key=lambda field: int(field.tag))
+    else:
+        pymarc_record.add_ordered_field(*marc_fields)
+
+
+class ExportCancelled(Exception):
+    """Raised between records when an export is cancelled; no output files are left behind"""
+
+
+@dataclass
+class ExportProgress:
+    records_parsed: int = 0
+    records_built: int = 0
+    bytes_written: int = 0  ## * to the .mrc file
+
+
 def save_as_marc_files(
-    # headers: list[str],
-    data,
-    rows_from_gui: list[list[str]],
+    rows: Iterable[list[str]],
     file_name_with_path: Path,
     live_settings: Default_settings,
-) -> bool:
+    on_progress: Callable[[ExportProgress], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> int:
     """
     Saves the record set as .mrk & .mrc files;
     depending on settings, also creates an excel CHU file
-    for once the marc files have been uploaded to ALMA
+    for once the marc files have been uploaded to ALMA.
+    The rows are parsed, built & written one at a time;
+    returns the number of records saved.
+    on_progress is called after each record is written;
+    if is_cancelled() turns True, ExportCancelled is raised & nothing is saved.
     """
-    records = parse_rows_into_records(rows_from_gui, live_settings)
-    marc_records = build_marc_records(records, live_settings.validation.mandatory_marc_fields)
-    write_marc21_files(marc_records, Path(file_name_with_path))
+    chu_rows: list[list[str]] = []
+    progress = ExportProgress()
+
+    def records_noting_chu_rows() -> Iterator[Record]:
+        for record in iter_records_from_rows(rows, live_settings):
+            if is_cancelled and is_cancelled():
+                raise ExportCancelled()
+            progress.records_parsed += 1
+            if live_settings.create_chu_file:
+                chu_rows.append(get_chu_row(record))
+            yield record
+
+    def note_record_written(bytes_written: int) -> None:
+        if is_cancelled and is_cancelled():
+            raise ExportCancelled()
+        progress.records_built += 1
+        progress.bytes_written = bytes_written
+        if on_progress:
+            on_progress(progress)
+
+    marc_records = iter_marc_records(
+        records_noting_chu_rows(),
+        live_settings.validation.mandatory_marc_fields,
+        live_settings.marc_build_workers,
+        live_settings.column_names,
+    )
+    record_count = write_marc21_files(
+        marc_records,
+        Path(file_name_with_path),
+        live_settings.native_mrc_writer,
+        note_record_written if on_progress or is_cancelled else None,
+    )
 
     if live_settings.create_chu_file:
-        write_chu_file(records, file_name_with_path)
+        io.write_CHU_file(chu_rows, file_name_with_path)
 
     # if live_settings.create_excel_file:
     #     io.write_data_to_excel([data.headers, *data.excel_rows], file_name_with_path.with_suffix(".xlsx"))
-
-    ## TODO: code for this value!
-    file_operations_successful = True
-    return file_operations_successful
+    return record_count
 
 
 def write_chu_file(marc_records: list[Record], file_name_with_path: Path) -> None:
@@ -2010,21 +2030,56 @@ def write_chu_file(marc_records: list[Record], file_name_with_path: Path) -> Non
     # chu_file = file_name_with_path.with_suffix(".CHU.xlsx")
     # chu_file = file_name_with_path.with_suffix(".xlsx")
     # io.write_CHU_file_1(excel_rows, chu_file, barcode_index)
-    chu_rows = [
-        [record.barcode, "", "", record.item_policy, "Relocating to CSF", ""]
-        for record in marc_records
-    ]
+    chu_rows = [get_chu_row(record) for record in marc_records]
     # io.write_CHU_file(chu_rows, chu_file)
     io.write_CHU_file(chu_rows, file_name_with_path)
 
 
-def write_marc21_files(records: list[PyRecord], file_name_and_path: Path) -> None:
+def get_chu_row(record: Record) -> list[str]:
+    return [record.barcode, "", "", record.item_policy, "Relocating to CSF", ""]
+
+
+def write_marc21_files(
+    records: Iterable[PyRecord],
+    file_name_and_path: Path,
+    native_mrc_writer=True,
+    on_record_written: Callable[[int], None] | None = None,
+) -> int:
+    """
+    Each record is written to the .mrk & the .mrc file in a single pass;
+    returns the number of records written.
+    Both are written atomically (io.open_for_atomic_write),
+    so a failed or cancelled export leaves no partial files behind.
+    on_record_written gets the bytes written to the .mrc file so far (it may raise to stop the export).
+    """
+    count = 0
+    mrk_file_path = file_name_and_path.with_suffix(".mrk")
+    mrc_file_path = file_name_and_path.with_suffix(".mrc")
+    try:
+        with (
+            io.open_for_atomic_write(mrk_file_path, newline="", encoding="utf-8") as mrk_file,
+            io.open_for_atomic_write(mrc_file_path, "wb") as mrc_file,
+        ):
+            mrk_writer = TextWriter(mrk_file)
+            iso_writer = Iso2709Writer(mrc_file) if native_mrc_writer else None
+            mrc_writer = iso_writer or MARCWriter(mrc_file)
+            for record in records:
+                mrk_writer.write(record)
+                mrc_writer.write(record)
+                count += 1
+                if on_record_written:
+                    pending = len(iso_writer.buffer) if iso_writer else 0
+                    on_record_written(mrc_file.tell() + pending)
+            if iso_writer:
+                iso_writer.flush()
+    finally:
+        if hasattr(records, "close"):
+            ## * e.g. stops a parallel build that's still in flight
+            records.close()
     logger.info(
-        f"\nWriting {len(records)} marc21 record(s) to {file_name_and_path.with_suffix("")}.mrk / .mrc"
+        f"\nWrote {count} marc21 record(s) to {file_name_and_path.with_suffix("")}.mrk / .mrc"
     )
-    # print(f"Writing {len(records)} record(s) to {file_name_and_path}")
-    write_mrk_files(records, file_name_and_path.with_suffix(".mrk"))
-    write_mrc_binaries(records, file_name_and_path.with_suffix(".mrc"))
+    return count
 
 
 def write_mrk_files(data: list[PyRecord], file_name=Path("out.mrk")) -> None:
@@ -2034,7 +2089,16 @@ def write_mrk_files(data: list[PyRecord], file_name=Path("out.mrk")) -> None:
     writer.close()
 
 
-def write_mrc_binaries(data: list[PyRecord], file_name=Path("out.mrc")) -> None:
+def write_mrc_binaries(
+    data: Iterable[PyRecord], file_name=Path("out.mrc"), native_mrc_writer=False
+) -> None:
+    if native_mrc_writer:
+        with open(file_name, "wb") as mrc_file:
+            native_writer = Iso2709Writer(mrc_file)
+            for record in data:
+                native_writer.write(record)
+            native_writer.flush()
+        return
     writer = MARCWriter(open(file_name, "wb"))
     for record in data:
         # if record.
@@ -2042,6 +2106,64 @@ def write_mrc_binaries(data: list[PyRecord], file_name=Path("out.mrc")) -> None:
     writer.close()
 
 
+class Iso2709Writer:
+    """
+    Writes .mrc (ISO 2709) records straight into a bytearray which is flushed in large writes.
+    The output is byte-for-byte that of pymarc's MARCWriter (see tests/test_iso2709_writer.py);
+    records it wasn't written for (non-unicode, non-numeric tags) are handed to pymarc.
+    """
+
+    LEADER_LEN = 24
+    END_OF_FIELD = b"\x1e"
+    END_OF_RECORD = b"\x1d"
+    SUBFIELD_INDICATOR = "\x1f"
+
+    def __init__(self, file_handle, buffer_size=1 << 20) -> None:
+        self.file_handle = file_handle
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+
+    def write(self, record: PyRecord) -> None:
+        self.buffer += self.as_iso2709(record)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.file_handle.write(self.buffer)
+        self.buffer.clear()
+
+    def as_iso2709(self, record: PyRecord) -> bytes:
+        leader = str(record.leader)
+        if leader[9] != "a":
+            return record.as_marc()
+        directory = bytearray()
+        field_data = bytearray()
+        for field in record.fields:
+            if not field.tag.isdigit():
+                return record.as_marc()
+            if field.control_field:
+                data = f"{field.data}".encode("utf-8") + self.END_OF_FIELD  ## * as pymarc does
+            else:
+                data = (
+                    f"{field.indicator1}{field.indicator2}"
+                    + "".join(
+                        f"{self.SUBFIELD_INDICATOR}{subfield.code}{subfield.value}"
+                        for subfield in field.subfields
+                    )
+                ).encode("utf-8") + self.END_OF_FIELD
+            directory += b"%03d%04d%05d" % (int(field.tag), len(data), len(field_data))
+            field_data += data
+        directory += self.END_OF_FIELD
+        field_data += self.END_OF_RECORD
+        base_address = self.LEADER_LEN + len(directory)
+        record_length = base_address + len(field_data)
+        return (
+            f"{record_length:0>5}{leader[5:12]}{base_address:0>5}{leader[17:]}".encode("utf-8")
+            + directory
+            + field_data
+        )
+
+
 ## TODO: rethink this CLI version; not up-to-date
 # def run() -> None:
 #     # for file in Path(settings.data_dir).glob("*.xls[xm]"):
@@ -0,0 +1,142 @@
+"""
+In-memory full-text search over the loaded records (logic.Data.excel_rows).
+An inverted index maps each token to the rows it appears in;
+it is built once on load & kept up to date as records are added, updated & deleted.
+"""
+
+import bisect
+import logging
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+")
+## * barcodes & ISBNs are also indexed whole, without their spaces & hyphens, for exact lookups
+IDENTIFIER_SEPARATORS_RE = re.compile(r"[\s-]+")
+IDENTIFIER_RE = re.compile(r"\d[\dx]{4,}")
+
+
+@dataclass
+class SearchIndex:
+    """
+    Rows get a stable id when indexed (so a deletion doesn't renumber the postings);
+    row_ids maps each row's position in excel_rows to its id.
+    """
+
+    postings: dict[str, set[int]] = field(default_factory=dict)
+    tokens_by_id: dict[int, frozenset[str]] = field(default_factory=dict)
+    row_ids: list[int] = field(default_factory=list)
+    sorted_tokens: list[str] = field(default_factory=list)  ## * for prefix queries
+    next_id: int = 0
+    position_by_id: dict[int, int] | None = None  ## * rebuilt lazily after a deletion
+
+
+def build_search_index(rows: Iterable[list[str]]) -> SearchIndex:
+    index = SearchIndex()
+    for row in rows:
+        index_row(index, len(index.row_ids), row, keep_sorted=False)
+    index.sorted_tokens = sorted(index.postings)
+    index.position_by_id = {row_id: position for position, row_id in enumerate(index.row_ids)}
+    return index
+
+
+def get_tokens(row: Iterable[str]) -> frozenset[str]:
+    cells = [cell.lower() for cell in row if cell and isinstance(cell, str)]
+    tokens = set(TOKEN_RE.findall(" ".join(cells)))
+    for cell in cells:
+        if len(cell) > 4 and cell[0].isdigit():
+            identifier = IDENTIFIER_SEPARATORS_RE.sub("", cell)
+            if IDENTIFIER_RE.fullmatch(identifier):
+                tokens.add(identifier)
+    return frozenset(tokens)
+
+
+def index_row(
+    index: SearchIndex, position: int, row: list[str], keep_sorted: bool = True
+) -> None:
+    """
+    Indexes a new row at position (normally the end) or re-indexes the row already there.
+    keep_sorted=False leaves sorted_tokens to be sorted once the whole file is indexed.
+    """
+    if position < len(index.row_ids):
+        row_id = index.row_ids[position]
+        remove_tokens(index, row_id)
+    else:
+        row_id = index.next_id
+        index.next_id += 1
+        index.row_ids.insert(position, row_id)
+        if position < len(index.row_ids) - 1:
+            index.position_by_id = None
+        elif index.position_by_id is not None:
+            index.position_by_id[row_id] = position
+    tokens = get_tokens(row)
+    index.tokens_by_id[row_id] = tokens
+    postings = index.postings
+    for token in tokens:
+        if token in postings:
+            postings[token].add(row_id)
+        else:
+            postings[token] = {row_id}
+            if keep_sorted:
+                bisect.insort(index.sorted_tokens, token)
+
+
+def unindex_row(index: SearchIndex, position: int) -> None:
+    row_id = index.row_ids.pop(position)
+    remove_tokens(index, row_id)
+    del index.tokens_by_id[row_id]
+    index.position_by_id = None
+
+
+def remove_tokens(index: SearchIndex, row_id: int) -> None:
+    for token in index.tokens_by_id.get(row_id, ()):
+        ids = index.postings[token]
+        ids.discard(row_id)
+        if not ids:
+            del index.postings[token]
+            i = bisect.bisect_left(index.sorted_tokens, token)
+            if i < len(index.sorted_tokens) and index.sorted_tokens[i] == token:
+                del index.sorted_tokens[i]
+
+
+def search(index: SearchIndex, query: str) -> list[int]:
+    """
+    Returns the positions (in excel_rows) of the matching rows, in order.
+    A barcode / ISBN (spaces & hyphens ignored) is looked up exactly;
+    otherwise every word in the query must begin a word in the row.
+    """
+    query = query.strip().lower()
+    if not query:
+        return []
+    identifier = IDENTIFIER_SEPARATORS_RE.sub("", query)
+    if IDENTIFIER_RE.fullmatch(identifier) and identifier in index.postings:
+        return get_positions(index, index.postings[identifier])
+    terms = sorted(set(TOKEN_RE.findall(query)), key=len, reverse=True)
+    matches: set[int] | None = None
+    for term in terms:  ## * longest (most selective) first
+        term_matches = get_prefix_matches(index, term)
+        matches = term_matches if matches is None else matches & term_matches
+        if not matches:
+            return []
+    return get_positions(index, matches or set())
+
+
+def get_prefix_matches(index: SearchIndex, prefix: str) -> set[int]:
+    sorted_tokens = index.sorted_tokens
+    matches: set[int] = set()
+    for i in range(bisect.bisect_left(sorted_tokens, prefix), len(sorted_tokens)):
+        token = sorted_tokens[i]
+        if not token.startswith(prefix):
+            break
+        matches |= index.postings[token]
+    return matches
+
+
+def get_positions(index: SearchIndex, row_ids: set[int]) -> list[int]:
+    if index.position_by_id is None:
+        index.position_by_id = {
+            row_id: position for position, row_id in enumerate(index.row_ids)
+        }
+    return sorted(index.position_by_id[row_id] for row_id in row_ids)
@@ -116,6 +116,12 @@ class Default_settings:
     create_output_dir = True
     create_chu_file = True
     create_excel_file = True
+    ## * changes are journalled; the full .csv / .xlsx is only rewritten after this many changes (or on export / close)
+    compact_after_changes = 50
+    ## * processes used to build marc records (1 = serial, None = one per cpu); small files are always built serially
+    marc_build_workers: int | None = 1
+    ## * write .mrc files with marc_21.Iso2709Writer rather than pymarc's MARCWriter (same bytes, less cpu)
+    native_mrc_writer = True
     timestamp = (
         str(datetime.now(timezone.utc))
         .split(".")[0]
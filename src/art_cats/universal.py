@@ -20,8 +20,9 @@ def main():
 
     CUSTOM_LOG_FILE = settings.files.full_output_dir / "logger.log"
     log_setup.setup_app_logging(log_file_path=CUSTOM_LOG_FILE)
+    recovery_report = logic.recover_from_journal(settings)
 
-    form_gui.run(settings)
+    form_gui.run(settings, recovery_report)
 
 
 if __name__ == "__main__":
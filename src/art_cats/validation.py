@@ -1,6 +1,5 @@
 from collections.abc import Callable
 
-from art_cats import marc_21
 from .settings import Default_settings
 import logging
 logger = logging.getLogger(__name__)
@@ -100,10 +99,10 @@ def validate(
 def validate_marc21_country_codes(record_as_dict: dict, invalid: list, problem_items: list, row_num:int) -> tuple[list, list]:
     country = record_as_dict["country_name"]
     # state = record_as_dict["state"]
-    place = record_as_dict["place"]
-    country_code = marc_21.get_country_code(country, place, row_num)
-    if country and not country_code:
-        invalid.append(f"country of publication ({country}) is not recognized.")
+    from art_cats import marc_21
+
+    if country and not marc_21.is_recognised_country(country):
+        invalid.append(marc_21.describe_unrecognised_country(country))
         problem_items.append(country)
     return (invalid, problem_items)
 
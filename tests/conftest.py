@@ -0,0 +1,28 @@
+"""
+Fixtures shared by the tests: the rows of the sample files (input_files) as they are handed to marc_21.
+"""
+
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from art_cats import logic
+from art_cats.settings import Default_settings
+
+INPUT_DIR = Path(__file__).parent.parent / "input_files"
+
+
+@pytest.fixture
+def load_marc_rows() -> Callable[[str], tuple[Default_settings, list[list[str]]]]:
+    """Returns a loader: sample file name -> (its settings, its exportable rows formatted for MARC)"""
+
+    def load(file_name: str) -> tuple[Default_settings, list[list[str]]]:
+        settings = Default_settings()
+        settings.known_patterns = logic.known_patterns
+        settings.files.in_file = str(INPUT_DIR / file_name)
+        _, _, rows, _, COL = logic.get_existing_file(settings)
+        rows_to_export, _ = logic.filter_rows_for_export(rows, settings, COL)
+        return settings, list(logic.iter_rows_formatted_for_marc(rows_to_export, settings))
+
+    return load
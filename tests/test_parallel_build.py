@@ -0,0 +1,52 @@
+"""
+marc_21.iter_marc_records on a process pool (workers > 1) must give the same records, in the same order
+& with the same 880 linkage numbers, and the same log as the serial build.
+The pool is only used from PARALLEL_BUILD_THRESHOLD records, so the sample rows are copied past it.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+import pytest
+from pymarc import MARCReader
+
+from art_cats import marc_21
+
+SAMPLE_FILE = "AuctionCats.2025sep.updated.csv"  ## has parallel titles, so 880 fields
+BATCH_TIMESTAMP = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def build(
+    settings, rows: list[list[str]], workers: int, caplog: pytest.LogCaptureFixture
+) -> tuple[list[bytes], list[tuple[str, int, str]]]:
+    """The serialised records & the log of building them (the rows are parsed afresh for each build)"""
+    records = marc_21.parse_rows_into_records(rows, settings)
+    caplog.clear()
+    marc_records = marc_21.iter_marc_records(
+        records, settings.validation.mandatory_marc_fields, workers, settings.column_names
+    )
+    output = [marc_record.as_marc() for marc_record in marc_records]
+    log = [(record.name, record.levelno, record.getMessage()) for record in caplog.records]
+    assert len(output) == len(rows)
+    return output, log
+
+
+def test_parallel_build_matches_serial_build(
+    load_marc_rows, caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    settings, rows = load_marc_rows(SAMPLE_FILE)
+    copies = marc_21.PARALLEL_BUILD_THRESHOLD // len(rows) + 1
+    rows = rows * copies
+    ## * one 005 timestamp for both builds
+    start_export_batch = marc_21.start_export_batch
+    monkeypatch.setattr(
+        marc_21, "start_export_batch", lambda timestamp=None: start_export_batch(BATCH_TIMESTAMP)
+    )
+    caplog.set_level(logging.INFO)
+
+    serial_output, serial_log = build(settings, rows, 1, caplog)
+    parallel_output, parallel_log = build(settings, rows, 2, caplog)
+
+    assert "880" in {field.tag for record in MARCReader(b"".join(serial_output)) for field in record}
+    assert parallel_output == serial_output
+    assert parallel_log == serial_log
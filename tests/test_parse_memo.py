@@ -0,0 +1,60 @@
+"""
+Parsing rows with marc_21.ParseMemo must give the same Records, the same warnings
+& (as the memo hands the same result to every row with that value) the same MARC records as parsing without it.
+"""
+
+import logging
+from copy import deepcopy
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import pytest
+
+from art_cats import marc_21
+
+SAMPLE_FILES = (
+    "AuctionCats.2025sep.updated.csv",
+    "AuctionCats.2025noDates.xlsx",
+    "art_cat_test.csv",
+    "strachan_testData.csv",
+)
+BATCH_TIMESTAMP = datetime(2025, 1, 1, tzinfo=timezone.utc)
+LANGS = 1  ## the column of the rows formatted for MARC
+UNRECOGNISED_LANGS = "english/klingon"  ## norm_langs warns: a warning for the memo to replay
+
+
+def parse_and_build(
+    settings, rows: list[list[str]], memoize: bool, caplog: pytest.LogCaptureFixture
+) -> tuple[list[marc_21.Record], list[tuple[str, int, str]], list[bytes]]:
+    """The parsed records (before building adds their 880 links), the log & the serialised MARC records"""
+    caplog.clear()
+    records = list(marc_21.iter_records_from_rows(rows, settings, memoize))
+    parsed = [replace(deepcopy(record), timestamp=None) for record in records]
+    marc_records = marc_21.build_marc_records(records, settings.validation.mandatory_marc_fields)
+    log = [(record.name, record.levelno, record.getMessage()) for record in caplog.records]
+    return parsed, log, [marc_record.as_marc() for marc_record in marc_records]
+
+
+@pytest.mark.parametrize("file_name", SAMPLE_FILES)
+def test_memo_does_not_change_records_or_warnings(
+    file_name: str,
+    load_marc_rows,
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    settings, rows = load_marc_rows(file_name)
+    for row in rows[::2]:
+        row[LANGS] = UNRECOGNISED_LANGS
+    start_export_batch = marc_21.start_export_batch
+    monkeypatch.setattr(
+        marc_21, "start_export_batch", lambda timestamp=None: start_export_batch(BATCH_TIMESTAMP)
+    )
+    caplog.set_level(logging.INFO)
+
+    records, log, output = parse_and_build(settings, rows, False, caplog)
+    memo_records, memo_log, memo_output = parse_and_build(settings, rows, True, caplog)
+
+    assert any("klingon" in message for _, _, message in log)
+    assert memo_records == records
+    assert memo_log == log
+    assert memo_output == output
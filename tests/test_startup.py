@@ -0,0 +1,104 @@
+"""
+The start-up path of the order form (art_cats.universal) against a time budget:
+- the import of art_cats.universal, measured with `python -X importtime`,
+  must stay under IMPORT_BUDGET_MS & must not pull in the modules in DEFERRED_MODULES
+  (they are slow to import & most launches never need them, so the modules of art_cats
+  import them in the functions that use them, i.e. when an export or an Excel file needs them);
+- the time from launch to the launcher dialog being shown must stay under LAUNCHER_BUDGET_MS
+  (only checked with a display, or with QT_QPA_PLATFORM set, e.g. to offscreen).
+Each time is measured RUNS times in a fresh interpreter & the best run is compared with the budget.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+IMPORT_BUDGET_MS = 400
+LAUNCHER_BUDGET_MS = 500
+RUNS = 3
+
+DEFERRED_MODULES = ("pymarc", "openpyxl", "yaml", "tkinter", "unittest", "art_cats.marc_21")
+
+PROJECT_DIR = Path(__file__).parent.parent
+ENV = {**os.environ, "PYTHONPATH": str(PROJECT_DIR / "src")}
+
+## * runs the real start-up (universal.main) but reports & exits as soon as the launcher dialog is shown
+LAUNCHER_PROBE = """
+import sys
+from art_cats import form_gui, universal
+
+def show_and_exit(launcher):
+    launcher.show()
+    form_gui.QApplication.processEvents()
+    print("launcher shown", flush=True)
+    sys.exit(0)
+
+form_gui.LauncherDialog.exec = show_and_exit
+universal.main()
+"""
+
+
+def measure_import() -> tuple[float, set[str]]:
+    """Returns the cumulative import time (ms) of art_cats.universal & the modules imported"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import art_cats.universal"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=ENV,
+    )
+    imported = set()
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  ## the header line
+        imported.add(name.strip())
+        if name.strip() == "art_cats.universal":
+            total_us = int(cumulative)
+    return total_us / 1000, imported
+
+
+def measure_launcher(tmp_path: Path) -> float:
+    """Returns the time (ms) from starting the interpreter to the launcher dialog being shown"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", LAUNCHER_PROBE],
+        capture_output=True,
+        text=True,
+        env=ENV,
+        cwd=tmp_path,  ## the output dir & log are created where the app is launched
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    assert "launcher shown" in result.stdout, result.stderr
+    return elapsed
+
+
+def test_deferred_modules_are_not_imported_at_start_up() -> None:
+    _, imported = measure_import()
+    assert not imported.intersection(DEFERRED_MODULES)
+
+
+def test_import_is_within_budget() -> None:
+    best_import = min(measure_import()[0] for _ in range(RUNS))
+    assert best_import <= IMPORT_BUDGET_MS, f"import art_cats.universal: {best_import:.0f} ms"
+
+
+@pytest.mark.skipif(
+    not (
+        os.environ.get("QT_QPA_PLATFORM")
+        or os.environ.get("DISPLAY")
+        or os.environ.get("WAYLAND_DISPLAY")
+        or sys.platform in ("win32", "darwin")
+    ),
+    reason="no display (set QT_QPA_PLATFORM=offscreen to time the launcher without one)",
+)
+def test_launcher_dialog_is_within_budget(tmp_path: Path) -> None:
+    best_launcher = min(measure_launcher(tmp_path) for _ in range(RUNS))
+    assert best_launcher <= LAUNCHER_BUDGET_MS, f"launch to launcher dialog: {best_launcher:.0f} ms"